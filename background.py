@@ -0,0 +1,91 @@
+from array import array
+import multiprocessing
+import queue
+import threading
+import time
+from compactgrid import CompactGrid
+from components import components
+from landmarks import landmarks
+from search import HEURISTIC_SEARCHES, SEARCHES, heuristic_name
+
+# Where a background search runs
+THREAD = "thread"
+PROCESS = "process"
+
+EVENT_BATCH = 1024  # Visit events sent per queue message
+
+
+def snapshot(grid):
+    # Private copies of the terrain so the UI can keep editing while the worker searches
+    return grid.rows, grid.cols, bytearray(grid.walkable), array("H", grid.cost), grid.movement.name
+
+
+def search_job(events, cancelled, algorithm, terrain, start, goal, stats=None):
+    # Runs in the worker. Sends ("visit", codes) batches where each code is
+    # cell * 2 + kind, then ("done", path, expanded, elapsed, stats) where
+    # stats is the metrics.SearchStats counted into (a copy in a process).
+    rows, cols, walkable, cost, movement = terrain
+    grid = CompactGrid(rows, cols, walkable, cost, movement)
+    grid.build_neighbor_index()
+    components(grid)  # Labelled up front like the index, not inside the timed search
+    if algorithm in HEURISTIC_SEARCHES and heuristic_name(grid, algorithm) == "landmarks":
+        landmarks(grid)
+    codes = array("i")
+
+    def mark(kind, cell):
+        codes.append(cell * 2 + kind)
+
+    generator = SEARCHES[algorithm](grid, start, goal, mark, stats)
+    start_time = time.perf_counter()
+    try:
+        while True:
+            next(generator)
+            if len(codes) >= EVENT_BATCH:
+                if cancelled.is_set():
+                    return
+                events.put(("visit", codes))
+                codes = array("i")
+    except StopIteration as stop:
+        path, expanded = stop.value
+    elapsed = time.perf_counter() - start_time
+    if codes:
+        events.put(("visit", codes))
+    events.put(("done", path, expanded, elapsed, stats))
+
+
+def _run(job, events, cancelled, args):
+    try:
+        job(events, cancelled, *args)
+    except Exception as error:  # Reported to the UI instead of dying silently
+        events.put(("error", f"{type(error).__name__}: {error}"))
+
+
+class BackgroundTask:
+    # Runs job(events, cancelled, *args) in a daemon thread or a forked
+    # process; the UI polls events without blocking and may cancel at any time
+
+    def __init__(self, job, args, mode=THREAD):
+        if mode == PROCESS and "fork" in multiprocessing.get_all_start_methods():
+            # main.py has no __main__ guard, so a spawned child would start a second UI
+            context = multiprocessing.get_context("fork")
+            self.events = context.Queue()
+            self.cancelled = context.Event()
+            self.worker = context.Process(target=_run, args=(job, self.events, self.cancelled, args), daemon=True)
+        else:
+            self.events = queue.Queue()
+            self.cancelled = threading.Event()
+            self.worker = threading.Thread(target=_run, args=(job, self.events, self.cancelled, args), daemon=True)
+        self.worker.start()
+
+    def poll(self):
+        # The next message, or None when the worker has not produced one yet
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            return None
+
+    def cancel(self):
+        self.cancelled.set()
+        if isinstance(self.worker, multiprocessing.process.BaseProcess) and self.worker.is_alive():
+            self.worker.terminate()  # Unread queue data would otherwise keep it alive
+            self.worker.join()
@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from compactgrid import CompactGrid
+from distcache import DistanceCache
+from headless import solve, to_cell
+from mazeJSON import load_maze_from_json
+from search import SEARCHES
+
+# Per-process state set up by _attach_grid in each worker
+_worker_memory = None
+_worker_grid = None
+_worker_cache = None
+
+
+def load_maze(filename):
+    grid = CompactGrid()
+    load_maze_from_json(grid, filename)
+    return grid
+
+
+def share_grid(grid):
+    # Layout: walkable bytes followed by the uint16 cost array
+    size = grid.size
+    memory = shared_memory.SharedMemory(create=True, size=3 * size)
+    memory.buf[:size] = bytes(grid.walkable)
+    memory.buf[size:3 * size] = grid.cost.tobytes()
+    return memory
+
+
+def _attach_grid(name, rows, cols, movement, cache_bytes):
+    global _worker_memory, _worker_grid, _worker_cache
+    size = rows * cols
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    walkable = _worker_memory.buf[:size]
+    cost = _worker_memory.buf[size:3 * size].cast("H")
+    _worker_grid = CompactGrid(rows, cols, walkable, cost, movement)
+    if cache_bytes:
+        _worker_cache = DistanceCache(_worker_grid, cache_bytes)
+
+
+def _solve_chunk(algorithm, chunk, options):
+    return [(index, solve(_worker_grid, algorithm, start, goal, _worker_cache, **options))
+            for index, start, goal in chunk]
+
+
+def solve_batch(maze, queries, algorithm="A*", workers=None, chunk_size=None, cache_bytes=None, **options):
+    # Yields (query index, SolveResult) pairs in completion order. With
+    # cache_bytes each worker keeps a DistanceCache of that size. Other
+    # keywords (heuristic, weight) are passed on to headless.solve.
+    if algorithm not in SEARCHES:
+        raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {sorted(SEARCHES)}")
+    grid = load_maze(maze) if isinstance(maze, str) else maze
+    cells = [(index, to_cell(grid, start), to_cell(grid, goal)) for index, (start, goal) in enumerate(queries)]
+    if cache_bytes:
+        cells.sort(key=lambda query: query[1])  # Queries sharing a start land in the same chunk
+    if not cells:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool busy without paying IPC per query
+        chunk_size = max(1, len(cells) // (workers * 4))
+
+    memory = share_grid(grid)
+    try:
+        with ProcessPoolExecutor(workers, initializer=_attach_grid,
+                                 initargs=(memory.name, grid.rows, grid.cols, grid.movement.name, cache_bytes)) as pool:
+            futures = [pool.submit(_solve_chunk, algorithm, cells[i:i + chunk_size], options)
+                       for i in range(0, len(cells), chunk_size)]
+            for future in as_completed(futures):
+                yield from future.result()
+    finally:
+        memory.close()
+        memory.unlink()
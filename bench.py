@@ -0,0 +1,188 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+from compactgrid import CompactGrid
+from headless import solve
+from labyrinth import carve_backtracker, noise_terrain, scatter_obstacles
+from metrics import SearchStats
+from search import SEARCHES
+
+DEFAULT_SIZES = "30x40,100x100,300x300,1000x1000,2000x2000"
+FAMILIES = ["maze", "obstacles", "weighted", "terrain"]
+MAX_WEIGHT = 9
+
+# Algorithms whose running time explodes with the grid are only run up to this many cells
+MAX_CELLS = {"IDDFS": 2500}
+
+
+def make_maze(family, rows, cols, seed):
+    # Same (family, size, seed) always gives the same maze, start and goal
+    rng = random.Random(f"{seed}:{family}:{rows}x{cols}")
+    grid = CompactGrid(rows, cols)
+    size = grid.size
+    if family == "maze":
+        carve_backtracker(grid, rng)
+    elif family == "obstacles":
+        scatter_obstacles(grid, rng)
+    elif family == "terrain":
+        # Smooth value noise costs instead of independent ones
+        noise_terrain(grid, rng, MAX_WEIGHT)
+    elif family == "weighted":
+        # Every tile costs 1..MAX_WEIGHT, no walls
+        weights = rng.randbytes(size).translate(bytes(1 + byte % MAX_WEIGHT for byte in range(256)))
+        grid.cost[:] = array("H", iter(weights))  # iter(): array() would read raw bytes as uint16 pairs
+    else:
+        raise ValueError(f"Unknown maze family {family!r}, expected one of {FAMILIES}")
+
+    if family == "maze":
+        walkable = grid.walkable
+        start = walkable.find(1)
+        goal = walkable.rfind(1)
+    else:
+        start, goal = 0, size - 1
+        grid.walkable[start] = grid.walkable[goal] = 1
+    grid.invalidate_neighbor_index()
+    grid.build_neighbor_index()
+    return grid, start, goal
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of an already sorted list
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))]
+
+
+def measure_memory(grid, algorithm, start, goal):
+    # Peak bytes allocated by one search, on top of the maze itself
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        solve(grid, algorithm, start, goal)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def bench_case(grid, algorithm, start, goal, repeat):
+    # Timed runs go without stats; one extra run collects the counters
+    times = []
+    for _ in range(repeat):
+        result = solve(grid, algorithm, start, goal)
+        times.append(result.elapsed)
+    times.sort()
+    stats = SearchStats(algorithm)
+    solve(grid, algorithm, start, goal, stats=stats)
+    return {
+        "found": result.found,
+        "cost": result.cost,
+        "expanded": result.expanded,
+        "pushes": stats.pushes,
+        "stale": stats.stale,
+        "revisits": stats.revisits,
+        "peak_frontier": stats.peak_open,
+        "setup_time": stats.setup_time,
+        "peak_memory": measure_memory(grid, algorithm, start, goal),
+        "time": {"min": times[0], "p50": percentile(times, 0.5), "p90": percentile(times, 0.9), "max": times[-1]},
+    }
+
+
+def run(sizes, families, algorithms, repeat, seed, out=sys.stdout):
+    results = []
+    for rows, cols in sizes:
+        for family in families:
+            started = time.perf_counter()
+            grid, start, goal = make_maze(family, rows, cols, seed)
+            print(f"{family} {rows}x{cols} (built in {time.perf_counter() - started:.1f}s)", file=out)
+            for algorithm in algorithms:
+                case = {"family": family, "rows": rows, "cols": cols, "algorithm": algorithm}
+                if grid.size > MAX_CELLS.get(algorithm, grid.size):
+                    case["skipped"] = True
+                    print(f"  {algorithm:<14} skipped", file=out)
+                else:
+                    case.update(bench_case(grid, algorithm, start, goal, repeat))
+                    print(f"  {algorithm:<14} cost {case['cost']!s:>8}  expanded {case['expanded']:>9}  "
+                          f"frontier {case['peak_frontier']:>8}  setup {case['setup_time'] * 1000:8.2f} ms  "
+                          f"memory {case['peak_memory'] / 1e6:8.2f} MB  "
+                          f"p50 {case['time']['p50'] * 1000:10.2f} ms  p90 {case['time']['p90'] * 1000:10.2f} ms",
+                          file=out)
+                results.append(case)
+    return results
+
+
+def compare(results, baseline, tolerance, out=sys.stdout):
+    # Prints p50 time and expansion changes against a baseline run and returns
+    # the number of cases that got slower by more than tolerance
+    previous = {(case["family"], case["rows"], case["cols"], case["algorithm"]): case
+                for case in baseline["results"] if not case.get("skipped")}
+    regressions = 0
+    print("\nComparison with baseline:", file=out)
+    for case in results:
+        key = (case["family"], case["rows"], case["cols"], case["algorithm"])
+        old = previous.get(key)
+        if case.get("skipped") or old is None:
+            continue
+        ratio = case["time"]["p50"] / old["time"]["p50"] if old["time"]["p50"] else 1.0
+        verdict = ""
+        if ratio > 1 + tolerance:
+            verdict = "SLOWER"
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            verdict = "faster"
+        if case["expanded"] != old["expanded"] or case["cost"] != old["cost"]:
+            verdict += " (expanded {} -> {}, cost {} -> {})".format(old["expanded"], case["expanded"], old["cost"], case["cost"])
+        print(f"  {case['family']} {case['rows']}x{case['cols']} {case['algorithm']:<14} "
+              f"p50 {ratio - 1:+7.1%} {verdict}", file=out)
+    return regressions
+
+
+def parse_sizes(text):
+    sizes = []
+    for item in text.split(","):
+        rows, _, cols = item.partition("x")
+        sizes.append((int(rows), int(cols)))
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the search algorithms on seeded maze families.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma separated ROWSxCOLS (default {DEFAULT_SIZES})")
+    parser.add_argument("--families", default=",".join(FAMILIES), help="comma separated maze families")
+    parser.add_argument("--algorithms", default=",".join(SEARCHES), help="comma separated algorithm names")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (default 3)")
+    parser.add_argument("--seed", type=int, default=0, help="maze seed (default 0)")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative p50 slowdown reported as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    algorithms = args.algorithms.split(",")
+    unknown = [name for name in algorithms if name not in SEARCHES]
+    if unknown:
+        parser.error(f"unknown algorithms {unknown}, expected some of {list(SEARCHES)}")
+    results = run(parse_sizes(args.sizes), args.families.split(","), algorithms, args.repeat, args.seed)
+
+    if args.json:
+        report = {
+            "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                     "seed": args.seed, "repeat": args.repeat, "date": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results,
+        }
+        with open(args.json, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+        print(f"Results written to {args.json}")
+    if args.baseline:
+        with open(args.baseline) as json_file:
+            baseline = json.load(json_file)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,13 @@ import pygame
 from settings import *
 
 
-algos = ["BFS", "DFS", "A*", "IDDFS", "FRINGE", "GREEDY BFS", "BIDIRECT BFS"]
+algos = ["BFS", "DFS", "A*", "JPS", "IDDFS", "LPA*", "FRINGE", "HPA*", "GREEDY BFS", "BIDIRECT BFS"]
 
 
 class Button:
     def __init__(self, text, x, y, width, height, callback, font_size=24):
         self.text = text
+        self.label = text  # What is drawn; may change while text keeps identifying the button
         self.rect = pygame.Rect(x, y, width, height)
         self.callback = callback
         self.font = pygame.font.SysFont(None, font_size)
@@ -16,8 +17,10 @@ class Button:
         self.text_color = BLACK
         self.active_color = ACTIVE_BTN
         self.is_active = False
+        self.drawn_color = None  # Color of the last refresh, None forces a redraw
+        self.drawn_label = None
 
-    def draw(self, surface):
+    def get_color(self):
         mouse_pos = pygame.mouse.get_pos()
 
         if self.is_active:
@@ -32,14 +35,26 @@ class Button:
             color = (100, 170, 255) if self.rect.collidepoint(mouse_pos) else DESCRIPTION_BTN
         else:
             color = (130, 145, 170) if self.rect.collidepoint(mouse_pos) else DEFAULT_BTN
+        return color
 
+    def draw(self, surface):
+        color = self.get_color()
         pygame.draw.rect(surface, color, self.rect)
         pygame.draw.rect(surface, WARM_GRAY, self.rect, 2)  # border
 
         # Draw text centered
-        text_surf = self.font.render(self.text, True, self.text_color)
+        text_surf = self.font.render(self.label, True, self.text_color)
         text_rect = text_surf.get_rect(center=self.rect.center)
         surface.blit(text_surf, text_rect)
+        self.drawn_color = color
+        self.drawn_label = self.label
+
+    def refresh(self, surface):
+        # Redraws the button only when hovering, activation or its label changed
+        if self.get_color() == self.drawn_color and self.label == self.drawn_label:
+            return None
+        self.draw(surface)
+        return self.rect
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -0,0 +1,321 @@
+from array import array
+from collections import deque
+import itertools
+import sys
+from settings import *
+from movement import DIAGONAL_COST, MOVEMENTS
+
+# Bits stored in CompactGrid.flags
+START = 1
+END = 2
+PATH = 4
+
+BLOCKED_COLOR = (40, 40, 40)
+
+CHANGE_LOG_LIMIT = 4096  # Edits remembered for incremental consumers
+
+# bytes.translate tables mapping every byte to 0/1
+_NOT_ZERO = bytes([0]) + bytes([1]) * 255
+_NOT_ONE = bytes([1, 0]) + bytes([1]) * 254
+
+
+class CompactGrid:
+
+    def __init__(self, rows=GRID_ROWS, cols=GRID_COLS, walkable=None, cost=None, movement=MOVEMENT):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        # One entry per cell, indexed by row * cols + col. Callers may pass in
+        # existing buffers (e.g. shared memory views) for walkable and cost.
+        self.walkable = walkable if walkable is not None else bytearray(b"\x01") * self.size
+        self.cost = cost if cost is not None else array("H", [1]) * self.size
+        self.terrain = self  # Grid owning walkable and cost; caches derived from the maze are kept for it
+        self.flags = bytearray(self.size)
+        # Colors are stored as indices into a small palette instead of a tuple per cell
+        self.palette = [GRID_FILL]
+        self.palette_index = {GRID_FILL: 0}
+        self.color = bytearray(self.size)
+        self.start_id = -1
+        self.end_id = -1
+        # Bumped on every walkability or cost change so caches can tell the maze changed
+        self.version = 0
+        # Cells changed by the last len(change_log) versions; older changes are
+        # only known to have happened. Bulk edits empty it and raise log_floor.
+        self.change_log = deque(maxlen=CHANGE_LOG_LIMIT)
+        self.log_floor = 0
+        self._uniform_version = -1
+        self._uniform = True
+        self._cost_range_version = -1
+        self._cost_range = (1, 1)
+        self.movement = MOVEMENTS[movement]
+        # CSR neighbor index: cell u owns adj[offsets[u]:offsets[u + 1]] and the
+        # first degree[u] entries of that slot are its walkable neighbors.
+        # With diagonal movement, diagonal_step[k] is 1 when adj[k] is a diagonal step.
+        self.offsets = None
+        self.adj = None
+        self.degree = None
+        self.diagonal_step = None
+
+    def index(self, row, col):
+        return row * self.cols + col
+
+    def position(self, cell):
+        return divmod(cell, self.cols)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def color_index(self, color):
+        color = tuple(color)
+        index = self.palette_index.get(color)
+        if index is None:
+            index = len(self.palette)
+            if index > 255:
+                raise ValueError("Too many distinct tile colors")
+            self.palette.append(color)
+            self.palette_index[color] = index
+        return index
+
+    def get_color(self, cell):
+        return self.palette[self.color[cell]]
+
+    def set_color(self, cell, color):
+        self.paint(cell, self.color_index(color))
+
+    def paint(self, cell, index):
+        self.color[cell] = index
+
+    def set_flag(self, cell, flag, value):
+        if value:
+            self.flags[cell] |= flag
+        else:
+            self.flags[cell] &= ~flag
+
+    def set_movement(self, name):
+        movement = MOVEMENTS[name]
+        if movement is not self.movement:
+            self.movement = movement
+            self.invalidate_neighbor_index()  # Every neighbor list and everything searched over them changes
+
+    def set_walkable(self, cell, value):
+        value = 1 if value else 0
+        if self.walkable[cell] != value:
+            self.walkable[cell] = value
+            self._log_change(cell)
+            if self.adj is not None:
+                self.patch_neighbor_index(cell)
+
+    def set_cost(self, cell, cost):
+        if self.cost[cell] != cost:
+            self.cost[cell] = cost
+            self._log_change(cell)
+
+    def _log_change(self, cell):
+        self.version += 1
+        self.change_log.append(cell)
+
+    def changed_cells(self, since_version):
+        # Cells whose walkability or cost changed after since_version, or None
+        # when that is no longer known and the caller must start over
+        count = self.version - since_version
+        if since_version < self.log_floor or count > len(self.change_log):
+            return None
+        return set(itertools.islice(self.change_log, len(self.change_log) - count, None))
+
+    def uniform_cost(self):
+        # True when every walkable tile costs 1, cached until the grid changes
+        if self._uniform_version != self.version:
+            cost = self.cost
+            if min(cost) == max(cost) == 1:
+                self._uniform = True
+            else:
+                walkable = self.walkable
+                self._uniform = all(cost[cell] == 1 or not walkable[cell] for cell in range(self.size))
+            self._uniform_version = self.version
+        return self._uniform
+
+    def cost_range(self):
+        # (lowest, highest) cost of a walkable tile, cached until the grid changes
+        if self._cost_range_version != self.version:
+            cost = self.cost
+            low, high = min(cost), max(cost)
+            if low < 1:
+                # Free walls don't matter, only tiles a path can enter
+                walkable = self.walkable
+                low = min((cost[cell] for cell in range(self.size) if walkable[cell]), default=1)
+            self._cost_range = (low, high)
+            self._cost_range_version = self.version
+        return self._cost_range
+
+    def block_cell(self, cell):
+        self.set_walkable(cell, False)
+        self.set_color(cell, BLOCKED_COLOR)
+
+    def clear_cell(self, cell):
+        self.set_walkable(cell, True)
+        self.set_color(cell, GRID_FILL)
+        self.flags[cell] &= ~(START | END)
+        self.set_cost(cell, 1)
+
+    def set_start_cell(self, cell):
+        self.flags[cell] |= START
+        self.set_walkable(cell, True)
+        self.set_color(cell, START_TILE)
+
+    def set_end_cell(self, cell):
+        self.flags[cell] |= END
+        self.set_walkable(cell, True)
+        self.set_color(cell, GOAL_TILE)
+
+    def set_cell_cost(self, cell, cost=5):
+        self.set_cost(cell, cost)
+        self.set_color(cell, ORANGE)
+
+    def reset_cell(self, cell):
+        self.flags[cell] = 0
+        self.set_color(cell, GRAY)
+        self.set_walkable(cell, True)
+        self.set_cost(cell, 1)
+
+    def reset_all(self):
+        gray = self.color_index(GRAY)
+        self.walkable[:] = bytearray(b"\x01") * self.size
+        self.cost[:] = array("H", [1]) * self.size
+        self.flags[:] = bytearray(self.size)
+        self.color[:] = bytearray([gray]) * self.size
+        self.invalidate_neighbor_index()
+
+    def invalidate_neighbor_index(self):
+        # Call after writing self.walkable or self.cost directly; the index is rebuilt on next use
+        self.version += 1
+        self.change_log.clear()
+        self.log_floor = self.version
+        self.offsets = None
+        self.adj = None
+        self.degree = None
+        self.diagonal_step = None
+
+    def neighbor_index(self):
+        if self.adj is None:
+            self.build_neighbor_index()
+        return self.offsets, self.adj, self.degree
+
+    def build_neighbor_index(self):
+        if self.movement.diagonal:
+            self._build_diagonal_index()
+            return
+        rows, cols = self.rows, self.cols
+        offsets = array("i", bytes(4 * (self.size + 1)))
+        total = 0
+        for row in range(rows):
+            inner = 4 - (row == 0) - (row == rows - 1)
+            for col in range(cols):
+                offsets[row * cols + col] = total
+                total += inner - (col == 0) - (col == cols - 1)
+        offsets[self.size] = total
+        self.offsets = offsets
+        adj = self.adj = array("i", bytes(4 * total))
+        degree = self.degree = bytearray(self.size)
+        walkable = self.walkable
+        k = 0
+        for row in range(rows):
+            cell = row * cols
+            for col in range(cols):
+                first = k
+                if row > 0 and walkable[cell - cols]:
+                    adj[k] = cell - cols
+                    k += 1
+                if row < rows - 1 and walkable[cell + cols]:
+                    adj[k] = cell + cols
+                    k += 1
+                if col > 0 and walkable[cell - 1]:
+                    adj[k] = cell - 1
+                    k += 1
+                if col < cols - 1 and walkable[cell + 1]:
+                    adj[k] = cell + 1
+                    k += 1
+                degree[cell] = k - first
+                k = offsets[cell + 1]
+                cell += 1
+
+    def _build_diagonal_index(self):
+        # Slots hold all 8 neighbors a cell has inside the grid; filled one
+        # cell at a time, since corner rules look at the tiles beside each step
+        rows, cols = self.rows, self.cols
+        offsets = array("i", bytes(4 * (self.size + 1)))
+        total = 0
+        for row in range(rows):
+            inner = 3 - (row == 0) - (row == rows - 1)
+            for col in range(cols):
+                offsets[row * cols + col] = total
+                total += inner * (3 - (col == 0) - (col == cols - 1)) - 1
+        offsets[self.size] = total
+        self.offsets = offsets
+        self.adj = array("i", bytes(4 * total))
+        self.degree = bytearray(self.size)
+        self.diagonal_step = bytearray(total)
+        for cell in range(self.size):
+            self._fill_neighbors(cell)
+
+    def patch_neighbor_index(self, cell):
+        # Walkability of one cell only affects its own slot and its neighbors'
+        # slots; with diagonals, it is also a corner of the steps between them
+        self._fill_neighbors(cell)
+        row, col = divmod(cell, self.cols)
+        for drow, dcol in self.movement.directions:
+            if 0 <= row + drow < self.rows and 0 <= col + dcol < self.cols:
+                self._fill_neighbors(cell + drow * self.cols + dcol)
+
+    def _fill_neighbors(self, cell):
+        adj, diagonal_step, cols = self.adj, self.diagonal_step, self.cols
+        row, col = divmod(cell, cols)
+        k = self.offsets[cell]
+        first = k
+        for neighbor in self.movement.neighbors(self.walkable, self.rows, cols, cell):
+            adj[k] = neighbor
+            if diagonal_step is not None:
+                diagonal_step[k] = neighbor // cols != row and neighbor % cols != col
+            k += 1
+        self.degree[cell] = k - first
+
+    def path_cost(self, path):
+        # The start tile is free, every tile entered afterwards costs its
+        # weight, times DIAGONAL_COST when entered diagonally
+        cost = self.cost
+        total = sum(cost[cell] for cell in path[1:])
+        if self.movement.diagonal:
+            cols = self.cols
+            entered = sum(cost[b] for a, b in zip(path, path[1:]) if a // cols != b // cols and a % cols != b % cols)
+            if entered:
+                total += (DIAGONAL_COST - 1) * entered
+        return total
+
+    def recolor_from_terrain(self):
+        # Rebuild colors and the start/end flags from walkable, cost and the
+        # start/end ids after a bulk load. Works on whole arrays: each cell's
+        # (walkable, costly) pair becomes one byte via big-integer arithmetic
+        # and bytes.translate maps it to a palette index, all at C speed.
+        size = self.size
+        cost_bytes = memoryview(self.cost).cast("B")
+        low = bytes(cost_bytes[0::2]) if sys.byteorder == "little" else bytes(cost_bytes[1::2])
+        high = bytes(cost_bytes[1::2]) if sys.byteorder == "little" else bytes(cost_bytes[0::2])
+        costly = (int.from_bytes(low.translate(_NOT_ONE), "little")
+                  | int.from_bytes(high.translate(_NOT_ZERO), "little"))
+        walkable = int.from_bytes(bytes(self.walkable).translate(_NOT_ZERO), "little")
+        codes = ((walkable << 1) | costly).to_bytes(size, "little")
+        blocked = self.color_index(BLOCKED_COLOR)
+        table = bytes([blocked, blocked, self.color_index(GRID_FILL), self.color_index(ORANGE)]) + bytes(252)
+        self.color[:] = codes.translate(table)
+        self.flags[:] = bytes(size)
+        if self.start_id >= 0:
+            self.set_start_cell(self.start_id)
+        if self.end_id >= 0:
+            self.set_end_cell(self.end_id)
+
+    def repaint(self, colors):
+        # Replace every cell's palette index at once from a bytes-like of size bytes
+        self.color[:] = colors
+
+    def nbytes(self):
+        return (len(self.walkable) + len(self.flags) + len(self.color)
+                + self.cost.itemsize * len(self.cost))
@@ -0,0 +1,182 @@
+from array import array
+from collections import Counter, deque
+import weakref
+
+
+class Components:
+    # Connected regions of walkable cells. Every walkable cell carries a
+    # region id (walls carry -1) and ids are merged with union-find, so
+    # connected(a, b) is two lookups and two finds. Opening a wall only
+    # unions ids. Closing one can split a region; searches from its open
+    # neighbours run in turns until all but one have met or run out, so the
+    # work is bounded by the pieces that broke off, not by the region.
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.version = None  # Grid version the labels match, None before the first build
+
+    def build(self):
+        grid = self.grid
+        offsets, adj, degree = grid.neighbor_index()
+        walkable = grid.walkable
+        label = self.label = array("i", [-1]) * grid.size
+        self.parent = array("i")  # Union-find forest over region ids
+        for cell in range(grid.size):
+            if label[cell] >= 0 or not walkable[cell]:
+                continue
+            region = self._new_region()
+            label[cell] = region
+            queue = deque([cell])
+            while queue:
+                current = queue.popleft()
+                base = offsets[current]
+                for k in range(base, base + degree[current]):
+                    neighbor = adj[k]
+                    if label[neighbor] < 0:
+                        label[neighbor] = region
+                        queue.append(neighbor)
+        self.version = grid.version
+
+    def sync(self):
+        grid = self.grid
+        if self.version == grid.version:
+            return
+        cells = None if self.version is None else grid.changed_cells(self.version)
+        if cells is None:
+            self.build()
+            return
+        # Cost edits leave the labels alone. Closed cells are handled first,
+        # against the regions as they were minus the new walls; the cells
+        # opened are then joined to what they touch. The cells closed together
+        # are split as one: a cell beside another new wall may have a single
+        # open neighbor left and still cut a region in two with it.
+        walkable, label = grid.walkable, self.label
+        closed = [cell for cell in cells if not walkable[cell] and label[cell] >= 0]
+        for cell in closed:
+            label[cell] = -1
+        starts = []
+        for cell in closed:
+            starts.extend(self._open_neighbors(cell))
+        self._split(list(dict.fromkeys(starts)))
+        for cell in cells:
+            if walkable[cell] and label[cell] < 0:
+                self._join(cell)
+        self.version = grid.version
+
+    def _new_region(self):
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, region):
+        parent = self.parent
+        while parent[region] != region:
+            parent[region] = parent[parent[region]]  # Path halving
+            region = parent[region]
+        return region
+
+    def _open_neighbors(self, cell):
+        # Labelled cells a step from cell. The index lists a wall's neighbors
+        # too, which are the cells it touched before it was closed.
+        offsets, adj, degree = self.grid.neighbor_index()
+        base = offsets[cell]
+        return [adj[k] for k in range(base, base + degree[cell]) if self.label[adj[k]] >= 0]
+
+    def _join(self, cell):
+        regions = {self.find(self.label[neighbor]) for neighbor in self._open_neighbors(cell)}
+        if not regions:
+            self.label[cell] = self._new_region()
+            return
+        region = regions.pop()
+        for other in regions:
+            self.parent[other] = region
+        self.label[cell] = region
+
+    def _split(self, starts):
+        # starts are the open neighbors of the cells just closed
+        if len(starts) < 2:
+            return  # Closing dead ends or isolated cells splits nothing
+        offsets, adj, degree = self.grid.neighbor_index()
+        label = self.label
+        owner = {start: i for i, start in enumerate(starts)}  # Cell -> search that reached it first
+        group = list(range(len(starts)))  # Searches that met share a group
+        queues = [deque([start]) for start in starts]
+        visited = [[start] for start in starts]
+
+        def group_of(i):
+            while group[i] != i:
+                i = group[i]
+            return i
+
+        while True:
+            live = {group_of(i) for i, queue in enumerate(queues) if queue}
+            if len(live) < 2:
+                break
+            for i, queue in enumerate(queues):
+                if not queue:
+                    continue
+                current = queue.popleft()
+                base = offsets[current]
+                for k in range(base, base + degree[current]):
+                    neighbor = adj[k]
+                    if label[neighbor] < 0:
+                        continue  # Closed in this sync, or opened and not joined yet
+                    j = owner.get(neighbor)
+                    if j is None:
+                        owner[neighbor] = i
+                        queue.append(neighbor)
+                        visited[i].append(neighbor)
+                    elif group_of(j) != group_of(i):
+                        group[group_of(j)] = group_of(i)
+
+        # A group none of whose searches is still running has seen all of
+        # its piece, which becomes a region of its own. The one group still
+        # running keeps the old id; if none is, the largest piece does.
+        pieces = {}
+        for i in range(len(starts)):
+            pieces.setdefault(group_of(i), []).append(i)
+        finished = [members for root, members in pieces.items() if root not in live]
+        if not live:
+            finished.remove(max(finished, key=lambda members: sum(len(visited[i]) for i in members)))
+        for members in finished:
+            region = self._new_region()
+            for i in members:
+                for reached in visited[i]:
+                    label[reached] = region
+
+    def connected(self, a, b):
+        label = self.label
+        return label[a] >= 0 and label[b] >= 0 and self.find(label[a]) == self.find(label[b])
+
+    def count(self):
+        return len({self.find(region) for region in self.label if region >= 0})
+
+    def largest(self):
+        # A cell of the region with the most cells, -1 when nothing is walkable
+        sizes = {}
+        member = {}  # Root -> one label id found under it
+        for region, cells in Counter(self.label).items():
+            if region >= 0:
+                root = self.find(region)
+                sizes[root] = sizes.get(root, 0) + cells
+                member[root] = region
+        if not sizes:
+            return -1
+        return self.label.index(member[max(sizes, key=sizes.get)])
+
+
+_components = weakref.WeakKeyDictionary()
+
+
+def components(grid):
+    # The Components kept for this grid's terrain, synced with its latest edits
+    grid = grid.terrain
+    found = _components.get(grid)
+    if found is None:
+        found = _components[grid] = Components(grid)
+    found.sync()
+    return found
+
+
+def connected(grid, a, b):
+    # True when a path between cells a and b exists
+    return components(grid).connected(a, b)
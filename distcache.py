@@ -0,0 +1,164 @@
+from array import array
+from collections import OrderedDict, deque
+from pqueue import monotone_queue
+
+# Cost models a cached tree can be built for
+UNIT = "unit"  # Every step costs 1 (what BFS minimises)
+WEIGHTED = "weighted"  # Entering a tile costs its weight (what A* minimises)
+
+ALGORITHM_MODELS = {
+    "BFS": UNIT,
+    "BIDIRECTIONAL": UNIT,
+    "IDDFS": UNIT,
+    "A*": WEIGHTED,
+    "JPS": WEIGHTED,
+    "FRINGE": WEIGHTED,
+}
+
+
+class DistanceTree:
+    # Shortest-path tree rooted at one cell. A forward tree holds distances
+    # from the root, a reverse tree holds distances to it; link[v] is the next
+    # cell towards the root (or -1).
+
+    def __init__(self, root, model, reverse, dist, link, expanded):
+        self.root = root
+        self.model = model
+        self.reverse = reverse
+        self.dist = dist
+        self.link = link
+        self.expanded = expanded
+
+    def nbytes(self):
+        return self.dist.itemsize * len(self.dist) + self.link.itemsize * len(self.link)
+
+    def path(self, other):
+        # Path between the root and other in travel order, None if unreachable
+        if self.dist[other] < 0:
+            return None
+        path = [other]
+        current = other
+        while current != self.root:
+            current = self.link[current]
+            path.append(current)
+        if not self.reverse:
+            path.reverse()
+        return path
+
+
+def build_tree(grid, root, model=WEIGHTED, reverse=False):
+    offsets, adj, degree = grid.neighbor_index()
+    cost = grid.cost
+    dist = array("i", [-1]) * grid.size
+    link = array("i", [-1]) * grid.size
+    dist[root] = 0
+    expanded = 0
+
+    if model == UNIT:
+        queue = deque([root])
+        while queue:
+            current = queue.popleft()
+            expanded += 1
+            next_dist = dist[current] + 1
+            base = offsets[current]
+            for k in range(base, base + degree[current]):
+                neighbor = adj[k]
+                if dist[neighbor] < 0:
+                    dist[neighbor] = next_dist
+                    link[neighbor] = current
+                    queue.append(neighbor)
+        return DistanceTree(root, model, reverse, dist, link, expanded)
+
+    # Dijkstra. Moving u -> v costs cost[v], so a reverse tree relaxes
+    # neighbor -> current with the weight of current instead. Distances pop
+    # in order and each push is at most one tile cost above the last pop.
+    open_set = monotone_queue(grid.cost_range()[1] + 1)
+    push, pop = open_set.push, open_set.pop
+    settled = bytearray(grid.size)
+    push(0, root)
+    while True:
+        current = pop()
+        if current < 0:
+            break
+        if settled[current]:
+            continue  # Stale entry
+        settled[current] = 1
+        current_dist = dist[current]
+        expanded += 1
+        step = cost[current]
+        base = offsets[current]
+        for k in range(base, base + degree[current]):
+            neighbor = adj[k]
+            tentative = current_dist + (step if reverse else cost[neighbor])
+            if dist[neighbor] < 0 or tentative < dist[neighbor]:
+                dist[neighbor] = tentative
+                link[neighbor] = current
+                push(tentative, neighbor)
+    return DistanceTree(root, model, reverse, dist, link, expanded)
+
+
+class DistanceCache:
+
+    def __init__(self, grid, max_bytes=256 * 1024 * 1024):
+        self.grid = grid
+        self.max_bytes = max_bytes
+        self.trees = OrderedDict()  # (version, root, model, reverse) -> DistanceTree, oldest first
+        self.nbytes = 0
+        self.version = grid.version
+        self.requests = {}  # How often each (cell, model, reverse) endpoint was asked for
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.trees.clear()
+        self.requests.clear()
+        self.nbytes = 0
+
+    def _check_version(self):
+        if self.grid.version != self.version:
+            self.clear()
+            self.version = self.grid.version
+
+    def lookup(self, root, model=WEIGHTED, reverse=False):
+        self._check_version()
+        key = (self.version, root, model, reverse)
+        tree = self.trees.get(key)
+        if tree is not None:
+            self.trees.move_to_end(key)
+        return tree
+
+    def tree(self, root, model=WEIGHTED, reverse=False):
+        tree = self.lookup(root, model, reverse)
+        if tree is None:
+            tree = build_tree(self.grid, root, model, reverse)
+            self._store((self.version, root, model, reverse), tree)
+        return tree
+
+    def _store(self, key, tree):
+        size = tree.nbytes()
+        if size > self.max_bytes:
+            return  # Would evict everything and still not fit
+        self.trees[key] = tree
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.trees.popitem(last=False)
+            self.nbytes -= evicted.nbytes()
+
+    def query(self, start, goal, model=WEIGHTED):
+        # Returns (path, expanded); expanded is 0 when a cached tree answered
+        tree = self.lookup(start, model) or self.lookup(goal, model, reverse=True)
+        if tree is not None:
+            self.hits += 1
+            return tree.path(goal if tree.root == start else start), 0
+
+        self.misses += 1
+        # Root the new tree at whichever endpoint has been asked for more often
+        from_start = self.requests.get((start, model, False), 0)
+        to_goal = self.requests.get((goal, model, True), 0)
+        self.requests[(start, model, False)] = from_start + 1
+        self.requests[(goal, model, True)] = to_goal + 1
+        if to_goal > from_start:
+            tree = self.tree(goal, model, reverse=True)
+            return tree.path(start), tree.expanded
+        tree = self.tree(start, model)
+        return tree.path(goal), tree.expanded
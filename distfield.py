@@ -0,0 +1,140 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # Fields are computed tile by tile instead
+    np = None
+
+# Breadth-first distance fields: the number of steps from one source tile to
+# every tile of the grid, found a whole BFS level at a time. Each reached
+# tile also records the direction (an index into grid.movement.directions)
+# of the step that entered it; following those back from any tile gives a
+# shortest path in steps. Within a level, tiles go to the first direction
+# in order that reaches them, with and without NumPy alike.
+
+
+def distance_field(grid, source):
+    # Returns (dist, parents) indexed by cell id: dist is -1 where the source
+    # cannot reach, parents is -1 at the source and at unreached tiles. NumPy
+    # int32 / int8 arrays when NumPy is installed, else array("i") / array("b").
+    if np is not None:
+        return _numpy_field(grid, source)
+    return _python_field(grid, source)
+
+
+def _numpy_field(grid, source):
+    # Cells live in a copy of the grid padded with one ring of walls, so a
+    # step never needs a bounds check. The frontier is an array of padded
+    # cell ids and every direction moves all of it with one add.
+    rows, cols = grid.rows, grid.cols
+    width = cols + 2
+    walk = np.zeros((rows + 2, width), dtype=bool)
+    walk[1:-1, 1:-1] = np.frombuffer(grid.walkable, dtype=np.uint8).reshape(rows, cols) != 0
+    walk = walk.ravel()
+    unseen = walk.copy()
+    dist = np.full(walk.size, -1, dtype=np.int32)
+    parents = np.full(walk.size, -1, dtype=np.int8)
+    start = (source // cols + 1) * width + source % cols + 1
+
+    if walk[start]:
+        unseen[start] = False
+        dist[start] = 0
+        corners = grid.movement.corners
+        steps = [(direction, drow * width + dcol, drow, dcol)
+                 for direction, (drow, dcol) in enumerate(grid.movement.directions)]
+        frontier = np.array([start], dtype=np.intp)
+        level = 0
+        while frontier.size:
+            level += 1
+            reached = []
+            for direction, step, drow, dcol in steps:
+                cells = frontier + step
+                found = unseen[cells]
+                if drow and dcol and corners:
+                    # Open tiles beside each diagonal step, as movement.py counts them
+                    found &= walk[frontier + dcol].astype(np.int8) + walk[frontier + drow * width] >= corners
+                cells = cells[found]
+                unseen[cells] = False  # One shift never hits a cell twice; later directions skip it
+                dist[cells] = level
+                parents[cells] = direction
+                reached.append(cells)
+            frontier = np.concatenate(reached)
+
+    inner = (slice(1, -1), slice(1, -1))
+    return (np.ascontiguousarray(dist.reshape(rows + 2, width)[inner]).ravel(),
+            np.ascontiguousarray(parents.reshape(rows + 2, width)[inner]).ravel())
+
+
+def _python_field(grid, source):
+    rows, cols = grid.rows, grid.cols
+    walkable = grid.walkable
+    dist = array("i", [-1]) * grid.size
+    parents = array("b", [-1]) * grid.size
+    if not walkable[source]:
+        return dist, parents
+    dist[source] = 0
+    corners = grid.movement.corners
+    frontier = [source]
+    level = 0
+    while frontier:
+        level += 1
+        reached = []
+        for direction, (drow, dcol) in enumerate(grid.movement.directions):
+            for cell in frontier:
+                row, col = divmod(cell, cols)
+                next_row, next_col = row + drow, col + dcol
+                if not (0 <= next_row < rows and 0 <= next_col < cols):
+                    continue
+                neighbor = next_row * cols + next_col
+                if dist[neighbor] >= 0 or not walkable[neighbor]:
+                    continue
+                if drow and dcol and (bool(walkable[row * cols + next_col])
+                                      + bool(walkable[next_row * cols + col])) < corners:
+                    continue
+                dist[neighbor] = level
+                parents[neighbor] = direction
+                reached.append(neighbor)
+        frontier = reached
+    return dist, parents
+
+
+def field_path(grid, dist, parents, goal):
+    # Cell ids from the field's source to goal, None when goal is unreachable
+    if dist[goal] < 0:
+        return None
+    cols = grid.cols
+    directions = grid.movement.directions
+    path = [goal]
+    cell = goal
+    while parents[cell] >= 0:
+        drow, dcol = directions[parents[cell]]
+        cell -= drow * cols + dcol
+        path.append(cell)
+    path.reverse()
+    return path
+
+
+def field_extent(dist):
+    # (tiles reached, steps to the farthest of them)
+    if np is not None:
+        dist = np.asarray(dist)
+        return int(np.count_nonzero(dist >= 0)), int(dist.max())
+    return sum(1 for steps in dist if steps >= 0), max(dist)
+
+
+def field_colors(grid, dist, shades):
+    # grid.color with every reached tile set to shades[i], the palette
+    # indices from nearest to farthest, split evenly over the distances
+    count = len(shades)
+    top = field_extent(dist)[1] + 1
+    if np is not None:
+        dist = np.asarray(dist)
+        colors = np.frombuffer(bytes(grid.color), dtype=np.uint8).copy()
+        reached = dist >= 0
+        colors[reached] = np.array(shades, dtype=np.uint8)[dist[reached].astype(np.int64) * count // top]
+        return colors.tobytes()
+    colors = bytearray(grid.color)
+    for cell, steps in enumerate(dist):
+        if steps >= 0:
+            colors[cell] = shades[steps * count // top]
+    return bytes(colors)
@@ -1,68 +1,91 @@
 import pygame
 from settings import *
+from compactgrid import CompactGrid, START, END, PATH, BLOCKED_COLOR
 
 
 class Tile:
+    # Lightweight view onto one cell of a CompactGrid; all state lives in the grid arrays
+    __slots__ = ("grid", "row", "col", "id")
 
-    def __init__(self, row, col):
+    def __init__(self, grid, row, col):
+        self.grid = grid
         self.row = row
         self.col = col
-        self.rect = pygame.Rect(col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-        self.walkable = True
-        self.color = GRID_FILL
-        self.is_start = False
-        self.is_end = False
-        self.is_path = False  # For visualization after algorithm runs
-        self.cost = 1  # Default cost is 1
+        self.id = row * grid.cols + col
+
+    @property
+    def rect(self):
+        size = self.grid.tile_size
+        return pygame.Rect(self.col * size, self.row * size, size, size)
+
+    @property
+    def walkable(self):
+        return self.grid.walkable[self.id] == 1
+
+    @walkable.setter
+    def walkable(self, value):
+        self.grid.set_walkable(self.id, value)
+
+    @property
+    def color(self):
+        return self.grid.get_color(self.id)
+
+    @color.setter
+    def color(self, value):
+        self.grid.set_color(self.id, value)
+
+    @property
+    def cost(self):
+        return self.grid.cost[self.id]
+
+    @cost.setter
+    def cost(self, value):
+        self.grid.set_cost(self.id, value)
+
+    @property
+    def is_start(self):
+        return bool(self.grid.flags[self.id] & START)
+
+    @is_start.setter
+    def is_start(self, value):
+        self.grid.set_flag(self.id, START, value)
+
+    @property
+    def is_end(self):
+        return bool(self.grid.flags[self.id] & END)
+
+    @is_end.setter
+    def is_end(self, value):
+        self.grid.set_flag(self.id, END, value)
+
+    @property
+    def is_path(self):
+        return bool(self.grid.flags[self.id] & PATH)
+
+    @is_path.setter
+    def is_path(self, value):
+        self.grid.set_flag(self.id, PATH, value)
 
     def draw(self, surface):
-        # Fill background color
-        if not self.walkable:
-            pygame.draw.rect(surface, (40, 40, 40), self.rect)
-        elif self.is_start:
-            pygame.draw.rect(surface, START_TILE, self.rect)
-        elif self.is_end:
-            pygame.draw.rect(surface, GOAL_TILE, self.rect)
-        else:
-            pygame.draw.rect(surface, self.color, self.rect)
-        pygame.draw.rect(surface, GRID_BORDER, self.rect, 1)
+        self.grid.draw_cell(surface, self.id)
 
     def set_blocked(self):
-        self.walkable = False
-        self.color = (40, 40, 40)
+        self.grid.block_cell(self.id)
 
     def set_clear(self):
-        self.walkable = True
-        self.color = GRID_FILL
-        self.is_start = False
-        self.is_end = False
-        self.cost = 1
+        self.grid.clear_cell(self.id)
 
     def set_start(self):
-        self.is_start = True
-        self.walkable = True
-        self.color = START_TILE
+        self.grid.set_start_cell(self.id)
 
     def set_end(self):
-        self.is_end = True
-        self.walkable = True
-        self.color = GOAL_TILE
+        self.grid.set_end_cell(self.id)
 
     def set_costly(self, cost=5):
-        self.cost = cost
-        self.color = ORANGE
+        self.grid.set_cell_cost(self.id, cost)
 
     def reset(self):
-        self.is_blocked = False
-        self.is_start = False
-        self.is_end = False
-        self.is_cost = False
-        self.g = float('inf')
-        self.h = float('inf')
-        self.f = float('inf')
-        self.color = GRAY
-        self.walkable = True
-        self.cost = 1
+        self.grid.reset_cell(self.id)
 
     def __hash__(self):
         return hash((self.row, self.col))
@@ -71,27 +94,151 @@ class Tile:
         return isinstance(other, Tile) and self.row == other.row and self.col == other.col
 
 
-class Grid:
+class TileRow:
+
+    def __init__(self, grid, row):
+        self.grid = grid
+        self.row = row
+
+    def __len__(self):
+        return self.grid.cols
+
+    def __getitem__(self, col):
+        if not 0 <= col < self.grid.cols:
+            raise IndexError(col)
+        return Tile(self.grid, self.row, col)
+
+    def __iter__(self):
+        for col in range(self.grid.cols):
+            yield Tile(self.grid, self.row, col)
+
+
+class TileRows:
+    # Stands in for the old list of lists of tiles; views are created on access
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __len__(self):
+        return self.grid.rows
 
-    def __init__(self):
-        self.rows = GRID_ROWS
-        self.cols = GRID_COLS
-        self.tiles = [[Tile(row, col) for col in range(self.cols)] for row in range(self.rows)]
+    def __getitem__(self, row):
+        if not 0 <= row < self.grid.rows:
+            raise IndexError(row)
+        return TileRow(self.grid, row)
+
+    def __iter__(self):
+        for row in range(self.grid.rows):
+            yield TileRow(self.grid, row)
+
+
+class Grid(CompactGrid):
+
+    def __init__(self, rows=GRID_ROWS, cols=GRID_COLS, tile_size=TILE_SIZE, walkable=None, cost=None):
+        super().__init__(rows, cols, walkable, cost)
+        self.tile_size = tile_size  # Pixels per tile; large grids use small tiles
+        self.tiles = TileRows(self)
         self.changed = False  # NEW
-        self.start_tile = None
-        self.end_tile = None
+        # Cells whose look changed since the last frame; bulk edits redraw everything
+        self.dirty = set()
+        self.redraw_all = True
+
+    @property
+    def start_tile(self):
+        return self.tile(self.start_id) if self.start_id >= 0 else None
+
+    @start_tile.setter
+    def start_tile(self, tile):
+        self.start_id = tile.id if tile else -1
+
+    @property
+    def end_tile(self):
+        return self.tile(self.end_id) if self.end_id >= 0 else None
+
+    @end_tile.setter
+    def end_tile(self, tile):
+        self.end_id = tile.id if tile else -1
+
+    def shared_view(self, tile_size=TILE_SIZE):
+        # A grid over the same walkable/cost arrays and neighbor index with its
+        # own colors and flags, for showing several searches of one maze at once.
+        # The maze must not be edited while views of it are in use.
+        view = Grid(self.rows, self.cols, tile_size, self.walkable, self.cost)
+        view.palette = list(self.palette)
+        view.palette_index = dict(self.palette_index)
+        view.color[:] = self.color
+        view.flags[:] = self.flags
+        view.start_id, view.end_id = self.start_id, self.end_id
+        view.terrain = self.terrain  # Views share the maze's component labels, landmarks and HPA* graph
+        view.movement = self.movement
+        view.offsets, view.adj, view.degree = self.neighbor_index()
+        view.diagonal_step = self.diagonal_step
+        return view
+
+    def tile(self, cell):
+        row, col = divmod(cell, self.cols)
+        return Tile(self, row, col)
 
     def draw(self, surface):
-        for row in self.tiles:
-            for tile in row:
-                tile.draw(surface)
+        for cell in range(self.size):
+            self.draw_cell(surface, cell)
+
+    def draw_cell(self, surface, cell):
+        row, col = divmod(cell, self.cols)
+        size = self.tile_size
+        rect = pygame.Rect(col * size, row * size, size, size)
+        # Fill background color
+        if not self.walkable[cell]:
+            surface.fill(BLOCKED_COLOR, rect)
+        elif self.flags[cell] & START:
+            surface.fill(START_TILE, rect)
+        elif self.flags[cell] & END:
+            surface.fill(GOAL_TILE, rect)
+        else:
+            surface.fill(self.palette[self.color[cell]], rect)
+        pygame.draw.rect(surface, GRID_BORDER, rect, 1)
+        return rect
+
+    def paint(self, cell, index):
+        self.color[cell] = index
+        self.dirty.add(cell)
+
+    def set_flag(self, cell, flag, value):
+        super().set_flag(cell, flag, value)
+        self.dirty.add(cell)
+
+    def set_walkable(self, cell, value):
+        super().set_walkable(cell, value)
+        self.dirty.add(cell)
+
+    def invalidate_neighbor_index(self):
+        super().invalidate_neighbor_index()
+        self.redraw_all = True  # The arrays were rewritten wholesale
+
+    def recolor_from_terrain(self):
+        super().recolor_from_terrain()
+        self.redraw_all = True
+
+    def repaint(self, colors):
+        super().repaint(colors)
+        self.redraw_all = True
+
+    def take_dirty(self):
+        # Cells to redraw this frame, or None when the whole grid should be
+        if self.redraw_all or len(self.dirty) > self.size // 4:
+            cells = None
+        else:
+            cells = self.dirty
+        self.dirty = set()
+        self.redraw_all = False
+        return cells
 
     def get_tile_at_pos(self, pos):
         x, y = pos
-        col = x // TILE_SIZE
-        row = y // TILE_SIZE
+        col = x // self.tile_size
+        row = y // self.tile_size
         if 0 <= row < self.rows and 0 <= col < self.cols:
-            return self.tiles[row][col]
+            return Tile(self, row, col)
         return None
 
     def toggle_block(self, pos):
@@ -133,27 +280,19 @@ class Grid:
             self.changed = True
 
     def get_neighbors(self, tile):
-        neighbors = []
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # Up, Down, Left, Right
-        for drow, dcol in directions:
-            row = tile.row + drow
-            col = tile.col + dcol
-            if 0 <= row < self.rows and 0 <= col < self.cols:
-                neighbor = self.tiles[row][col]
-                if neighbor.walkable:
-                    neighbors.append(neighbor)
-        return neighbors
+        offsets, adj, degree = self.neighbor_index()
+        base = offsets[tile.id]
+        return [self.tile(adj[k]) for k in range(base, base + degree[tile.id])]
 
     def clear_path(self):
-        for row in self.tiles:
-            for tile in row:
-                if not tile.is_start and not tile.is_end and tile.walkable and tile.cost != 5:
-                    tile.color = GRID_FILL
+        fill = self.color_index(GRID_FILL)
+        for cell in range(self.size):
+            if (self.color[cell] != fill and not self.flags[cell] & (START | END)
+                    and self.walkable[cell] and self.cost[cell] != 5):
+                self.paint(cell, fill)
 
     def clear(self):
-        for row in self.tiles:
-            for tile in row:
-                tile.reset()  # Reset each tile (unblock, remove cost, etc.)
+        self.reset_all()  # Reset each tile (unblock, remove cost, etc.)
 
         self.start = None  # Clear the start tile
         self.end = None  # Clear the end tile
@@ -161,5 +300,3 @@ class Grid:
 
     def reset_changed_flag(self):
         self.changed = False
-
-
@@ -0,0 +1,96 @@
+import time
+from search import HEURISTIC_SEARCHES, SEARCHES, heuristic_name, run_search, path_cost
+from distcache import ALGORITHM_MODELS, WEIGHTED
+from components import components
+from hpastar import cluster_graph
+from landmarks import landmarks
+from settings import *
+
+
+class SolveResult:
+
+    def __init__(self, algorithm, path, cost, expanded, elapsed, stats=None):
+        self.algorithm = algorithm
+        self.path = path  # List of (row, col) from start to goal, None if unreachable
+        self.cost = cost
+        self.expanded = expanded
+        self.elapsed = elapsed  # Wall time in seconds (perf_counter resolution)
+        self.stats = stats  # The metrics.SearchStats passed to solve(), if any
+
+    @property
+    def found(self):
+        return self.path is not None
+
+    def __repr__(self):
+        return (f"SolveResult({self.algorithm}, found={self.found}, cost={self.cost if self.cost is None else round(self.cost, 2)}, "
+                f"expanded={self.expanded}, elapsed={self.elapsed * 1000:.3f}ms)")
+
+
+def to_cell(grid, position):
+    # Accept either a cell id or a (row, col) pair
+    if isinstance(position, int):
+        cell = position
+    else:
+        row, col = position
+        if not grid.in_bounds(row, col):
+            raise ValueError(f"Position {position} is outside the grid")
+        cell = grid.index(row, col)
+    if not 0 <= cell < grid.size:
+        raise ValueError(f"Cell {cell} is outside the grid")
+    return cell
+
+
+def solve(grid, algorithm, start, goal, cache=None, stats=None, heuristic=None, weight=None):
+    # With a distcache.DistanceCache, shortest-path algorithms answer from cached
+    # trees, unless given a heuristic or weight other than the settings' default
+    # (which a cached answer would not reflect). A metrics.SearchStats given as stats is filled in and finished.
+    # heuristic (a name from search.HEURISTICS) and weight (weighted A*, at
+    # least 1) override the settings for the searches that use them; the
+    # grid's movement model is set with grid.set_movement().
+    search = SEARCHES.get(algorithm)
+    if search is None:
+        raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {sorted(SEARCHES)}")
+    options = {}
+    if heuristic is not None or weight is not None:
+        if algorithm not in HEURISTIC_SEARCHES:
+            raise ValueError(f"{algorithm} takes no heuristic, only {', '.join(HEURISTIC_SEARCHES)} do")
+        if heuristic is not None:
+            options["heuristic"] = heuristic_name(grid, algorithm, heuristic)
+        if weight is not None:
+            if algorithm == "GREEDY" or weight < 1:
+                raise ValueError(f"Weight {weight!r} not allowed, A* and FRINGE take one of at least 1")
+            options["weight"] = weight
+    start = to_cell(grid, start)
+    goal = to_cell(grid, goal)
+
+    grid.neighbor_index()  # Build outside the timed region
+    components(grid)  # Likewise the connected regions behind the "no path" check
+    diagonal = grid.movement.diagonal
+    if algorithm == "HPA*" and not diagonal:
+        cluster_graph(grid)  # And HPA*'s cluster graph
+    if (algorithm in HEURISTIC_SEARCHES and not diagonal
+            and heuristic_name(grid, algorithm, heuristic) == "landmarks"):
+        landmarks(grid)  # And the landmark distances of the ALT heuristic
+    begin = time.perf_counter()
+    model = ALGORITHM_MODELS.get(algorithm)
+    if model == WEIGHTED and diagonal:
+        model = None  # Cached trees only know straight steps
+    if algorithm in HEURISTIC_SEARCHES and (
+            heuristic_name(grid, algorithm, heuristic) != heuristic_name(grid, algorithm)
+            or (weight if weight is not None else HEURISTIC_WEIGHTS.get(algorithm, 1)) != 1):
+        model = None  # A cached tree would answer a plain search, not the heuristic and weight asked for
+    if not (grid.walkable[start] and grid.walkable[goal]):
+        path, expanded = None, 0
+    elif cache is not None and model is not None:
+        path, expanded = cache.query(start, goal, model)
+        if stats is not None:
+            stats.expanded = expanded  # Cache queries only report expansions
+    else:
+        path, expanded = run_search(search, grid, start, goal, stats, **options)
+    elapsed = time.perf_counter() - begin
+    if stats is not None:
+        stats.finish(grid, path, elapsed)
+
+    if path is None:
+        return SolveResult(algorithm, None, None, expanded, elapsed, stats)
+    return SolveResult(algorithm, [grid.position(cell) for cell in path], path_cost(grid, path), expanded, elapsed, stats)
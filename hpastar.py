@@ -0,0 +1,415 @@
+from array import array
+import weakref
+from settings import *
+from pqueue import HeapQueue, monotone_queue
+
+# Borders of a cluster shared with the cluster to its right / below it
+RIGHT = 0
+DOWN = 1
+
+
+class ClusterGraph:
+    # HPA* abstraction of a grid. The grid is cut into square clusters of
+    # cluster_size cells; every run of open cells along the border of two
+    # clusters is an entrance, crossed by one or two pairs of transition
+    # cells (one on each side). For every cluster the graph keeps the cost of
+    # the cheapest path inside it between each pair of its transition cells.
+    # Queries search this small graph and then refine only the route found.
+    # Edits rebuild just the clusters they touch and the ones next to them.
+
+    def __init__(self, grid, cluster_size=CLUSTER_SIZE):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.cluster_rows = -(-grid.rows // cluster_size)
+        self.cluster_cols = -(-grid.cols // cluster_size)
+        self.version = None  # Grid version the graph matches, None before the first build
+        self.rebuilt = 0  # Clusters rebuilt by the last sync()
+
+    def cluster_of(self, cell):
+        row, col = divmod(cell, self.grid.cols)
+        return row // self.cluster_size * self.cluster_cols + col // self.cluster_size
+
+    def build(self):
+        count = self.cluster_rows * self.cluster_cols
+        self.borders = {}  # (cluster, RIGHT/DOWN) -> [(cell, cell across the border)]
+        self.links = {}  # Transition cell -> transition cells paired with it across borders
+        self.nodes = [()] * count  # Transition cells of each cluster
+        self.costs = [None] * count  # n * n in-cluster costs between them, -1 if unreachable
+        for cluster in range(count):
+            row, col = divmod(cluster, self.cluster_cols)
+            if col + 1 < self.cluster_cols:
+                self._find_entrances(cluster, RIGHT)
+            if row + 1 < self.cluster_rows:
+                self._find_entrances(cluster, DOWN)
+        for cluster in range(count):
+            self._connect(cluster)
+        self.rebuilt = count
+        self.version = self.grid.version
+
+    def sync(self):
+        # Brings the graph up to date with the grid, rebuilding as little as possible
+        grid = self.grid
+        if self.version == grid.version:
+            self.rebuilt = 0
+            return
+        cells = None if self.version is None else grid.changed_cells(self.version)
+        if cells is None:
+            self.build()
+            return
+        self.rebuild({self.cluster_of(cell) for cell in cells})
+        self.version = grid.version
+
+    def rebuild(self, clusters):
+        # Entrances on all four borders of the edited clusters may have moved,
+        # which changes the transition cells of the clusters across them too
+        touched = set(clusters)
+        for cluster in clusters:
+            row, col = divmod(cluster, self.cluster_cols)
+            borders = []
+            if col + 1 < self.cluster_cols:
+                borders.append((cluster, RIGHT))
+            if row + 1 < self.cluster_rows:
+                borders.append((cluster, DOWN))
+            if col > 0:
+                borders.append((cluster - 1, RIGHT))
+            if row > 0:
+                borders.append((cluster - self.cluster_cols, DOWN))
+            for owner, side in borders:
+                self._find_entrances(owner, side)
+                touched.add(owner)
+                touched.add(owner + 1 if side == RIGHT else owner + self.cluster_cols)
+        for cluster in touched:
+            self._connect(cluster)
+        self.rebuilt = len(touched)
+
+    def _find_entrances(self, cluster, side):
+        grid = self.grid
+        walkable = grid.walkable
+        cols = grid.cols
+        size = self.cluster_size
+        cluster_row, cluster_col = divmod(cluster, self.cluster_cols)
+        if side == RIGHT:
+            col = (cluster_col + 1) * size - 1
+            cells = [row * cols + col for row in range(cluster_row * size, min((cluster_row + 1) * size, grid.rows))]
+            across = 1
+        else:
+            row = (cluster_row + 1) * size - 1
+            cells = [row * cols + col for col in range(cluster_col * size, min((cluster_col + 1) * size, cols))]
+            across = cols
+
+        for cell, other in self.borders.get((cluster, side), ()):
+            self._unlink(cell, other)
+            self._unlink(other, cell)
+
+        # Short entrances get one transition in the middle, long ones one every
+        # ENTRANCE_SPLIT tiles from the first and one at the last
+        pairs = []
+        run = []
+        for cell in cells + [-1]:
+            if cell >= 0 and walkable[cell] and walkable[cell + across]:
+                run.append(cell)
+            elif run:
+                if len(run) < ENTRANCE_SPLIT:
+                    pairs.append((run[len(run) // 2], run[len(run) // 2] + across))
+                else:
+                    for cell in run[:-1:ENTRANCE_SPLIT] + [run[-1]]:
+                        pairs.append((cell, cell + across))
+                run = []
+        for cell, other in pairs:
+            self.links.setdefault(cell, []).append(other)
+            self.links.setdefault(other, []).append(cell)
+        self.borders[(cluster, side)] = pairs
+
+    def _unlink(self, cell, other):
+        linked = self.links[cell]
+        linked.remove(other)
+        if not linked:
+            del self.links[cell]
+
+    def area(self, cluster):
+        size = self.cluster_size
+        cluster_row, cluster_col = divmod(cluster, self.cluster_cols)
+        top, left = cluster_row * size, cluster_col * size
+        return ClusterArea(self.grid, top, left, min(size, self.grid.rows - top), min(size, self.grid.cols - left))
+
+    def _connect(self, cluster):
+        # Collects the cluster's transition cells and their in-cluster path costs
+        row, col = divmod(cluster, self.cluster_cols)
+        nodes = []
+        for owner, side, index in ((cluster, RIGHT, 0), (cluster, DOWN, 0),
+                                   (cluster - 1, RIGHT, 1), (cluster - self.cluster_cols, DOWN, 1)):
+            if (side == RIGHT and index == 1 and col == 0) or (side == DOWN and index == 1 and row == 0):
+                continue
+            for pair in self.borders.get((owner, side), ()):
+                if pair[index] not in nodes:  # A corner cell can sit on two borders
+                    nodes.append(pair[index])
+        count = len(nodes)
+        costs = array("l", [-1]) * (count * count)
+        area = self.area(cluster)
+        cost = self.grid.cost
+        for i, cell in enumerate(nodes):
+            costs[i * count + i] = 0
+            # Paths back are the same cells walked the other way: they enter
+            # cell instead of other, so one search per pair is enough
+            reached = area.search(cell, nodes[i + 1:])[0]
+            for j in range(i + 1, count):
+                other = nodes[j]
+                if other in reached:
+                    costs[i * count + j] = reached[other]
+                    costs[j * count + i] = reached[other] - cost[other] + cost[cell]
+        self.nodes[cluster] = nodes
+        self.costs[cluster] = costs
+
+    def edges(self, cell):
+        # (neighbor, cost) pairs of a transition cell in the abstract graph
+        cost = self.grid.cost
+        for other in self.links.get(cell, ()):
+            yield other, cost[other]
+        cluster = self.cluster_of(cell)
+        nodes = self.nodes[cluster]
+        if cell in nodes:
+            count = len(nodes)
+            i = nodes.index(cell)
+            costs = self.costs[cluster]
+            for j, other in enumerate(nodes):
+                if j != i and costs[i * count + j] >= 0:
+                    yield other, costs[i * count + j]
+
+    def search(self, start, goal, visit=None, stats=None):
+        # Generator in the style of search.py: returns (path, expanded) and
+        # calls visit(cell) and yields for every abstract node expanded when
+        # visit is given. Expanded also counts the cells settled by the
+        # searches inside the start and goal clusters and by the refinement.
+        if start == goal:
+            return [start], 0
+        grid = self.grid
+        cols = grid.cols
+        goal_row, goal_col = divmod(goal, cols)
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+
+        # Tie start and goal into the graph through their clusters' transition cells
+        targets = list(self.nodes[start_cluster])
+        if start_cluster == goal_cluster:
+            targets.append(goal)
+        leave, _, expanded = self.area(start_cluster).search(start, targets)
+        best = leave.get(goal) if start_cluster == goal_cluster else None  # Route that stays in one cluster
+        arrive, _, settled = self.area(goal_cluster).search(goal, self.nodes[goal_cluster], reverse=True)
+        expanded += settled
+
+        # A* over the transition cells. Manhattan distance only bounds costs
+        # when no tile is free.
+        admissible = grid.cost_range()[0] >= 1
+        g = {start: 0}
+        parent = {start: -1}
+        closed = set()
+        via = -1  # Last transition cell before the goal on the best route, -1 for the direct one
+        # Ties go to the node furthest along; on open maps many routes share the best f
+        open_set = HeapQueue()
+        open_set.push((0, 0), start)
+        if stats is not None:
+            stats.pushes += 1
+        while True:
+            current = open_set.pop()
+            if current < 0:
+                break
+            if stats is not None:
+                stats.pops += 1
+            if current in closed:
+                if stats is not None:
+                    stats.stale += 1
+                continue
+            current_g = g[current]
+            if best is not None:
+                row, col = divmod(current, cols)
+                if current_g + (abs(row - goal_row) + abs(col - goal_col) if admissible else 0) >= best:
+                    break  # Nothing left in the queue can beat the route already found
+            closed.add(current)
+            expanded += 1
+            if stats is not None:
+                stats.expand(current, len(open_set))
+
+            if current in arrive and (best is None or current_g + arrive[current] < best):
+                best = current_g + arrive[current]
+                via = current
+            if current == start:
+                # Leaving the start cluster, or crossing a border if start is a transition cell itself
+                neighbors = list(leave.items()) + [(other, grid.cost[other]) for other in self.links.get(start, ())]
+            else:
+                neighbors = self.edges(current)
+            for neighbor, step in neighbors:
+                tentative = current_g + step
+                if neighbor in g and tentative >= g[neighbor]:
+                    if stats is not None:
+                        stats.revisits += 1
+                    continue
+                g[neighbor] = tentative
+                parent[neighbor] = current
+                row, col = divmod(neighbor, cols)
+                open_set.push((tentative + (abs(row - goal_row) + abs(col - goal_col) if admissible else 0), -tentative), neighbor)
+                if stats is not None:
+                    stats.pushes += 1
+            if visit is not None:
+                visit(current)
+                yield
+
+        if best is None:
+            return None, expanded
+        route = [goal]
+        current = via if via >= 0 else start
+        while current >= 0:
+            route.append(current)
+            current = parent[current]
+        route.reverse()
+        path, settled = self.refine(route)
+        return path, expanded + settled
+
+    def refine(self, route):
+        # Expands consecutive route cells into the full path. Cells in two
+        # clusters are paired transitions and adjacent; the rest are joined by
+        # a search inside their cluster.
+        path = [route[0]]
+        settled = 0
+        for cell, following in zip(route, route[1:]):
+            cluster = self.cluster_of(cell)
+            if cluster != self.cluster_of(following):
+                path.append(following)
+                continue
+            area = self.area(cluster)
+            _, parent, count = area.search(cell, [following])
+            settled += count
+            path += area.path(parent, following)
+        return path, settled
+
+    def nbytes(self):
+        # Approximate size of the cost tables and transition lists
+        return (sum(costs.itemsize * len(costs) for costs in self.costs if costs is not None)
+                + 8 * sum(len(nodes) for nodes in self.nodes) + 16 * sum(map(len, self.links.values())))
+
+
+
+class ClusterArea:
+    # One cluster as a graph of its own: its cells in row-major order, their
+    # costs and, by local index, the walkable neighbours inside the cluster
+
+    def __init__(self, grid, top, left, height, width):
+        cols = grid.cols
+        walkable = grid.walkable
+        self.top = top
+        self.left = left
+        self.width = width
+        self.cols = cols
+        self.cells = [(top + row) * cols + left + col for row in range(height) for col in range(width)]
+        self.cost = [grid.cost[cell] for cell in self.cells]
+        self.neighbors = []
+        walkable_costs = set()
+        for i, cell in enumerate(self.cells):
+            if not walkable[cell]:
+                self.neighbors.append(())
+                continue
+            walkable_costs.add(self.cost[i])
+            row, col = divmod(i, width)
+            local = []
+            if row > 0 and walkable[cell - cols]:
+                local.append(i - width)
+            if row + 1 < height and walkable[cell + cols]:
+                local.append(i + width)
+            if col > 0 and walkable[cell - 1]:
+                local.append(i - 1)
+            if col + 1 < width and walkable[cell + 1]:
+                local.append(i + 1)
+            self.neighbors.append(local)
+        # With one cost for every walkable cell a breadth-first search is enough
+        self.step = walkable_costs.pop() if len(walkable_costs) == 1 else None
+
+    def local(self, cell):
+        row, col = divmod(cell, self.cols)
+        return (row - self.top) * self.width + col - self.left
+
+    def search(self, source, targets, reverse=False):
+        # Cheapest costs from source (to it when reverse) to the target cells,
+        # stopping once all are settled. Returns {target: cost}, the local
+        # parent of every cell reached (-2 for the rest) and the cells settled.
+        neighbors = self.neighbors
+        start = self.local(source)
+        wanted = {self.local(cell): cell for cell in targets}
+        remaining = len(wanted)
+        reached = {}
+        parent = [-2] * len(self.cells)
+        parent[start] = -1
+        settled = 0
+        if not remaining:
+            return reached, parent, settled
+
+        if self.step is not None:
+            frontier = [start]
+            depth = 0
+            while frontier:
+                following = []
+                for i in frontier:
+                    settled += 1
+                    if i in wanted:
+                        reached[wanted[i]] = depth * self.step
+                        remaining -= 1
+                        if not remaining:
+                            return reached, parent, settled
+                    for j in neighbors[i]:
+                        if parent[j] == -2:
+                            parent[j] = i
+                            following.append(j)
+                frontier = following
+                depth += 1
+            return reached, parent, settled
+
+        cost = self.cost
+        dist = [-1] * len(cost)
+        dist[start] = 0
+        open_set = monotone_queue(max(cost) + 1)
+        push, pop = open_set.push, open_set.pop
+        push(0, start)
+        closed = bytearray(len(cost))
+        while True:
+            i = pop()
+            if i < 0:
+                break
+            if closed[i]:
+                continue
+            closed[i] = 1
+            settled += 1
+            current_dist = dist[i]
+            if i in wanted:
+                reached[wanted[i]] = current_dist
+                remaining -= 1
+                if not remaining:
+                    break
+            step = cost[i]
+            for j in neighbors[i]:
+                tentative = current_dist + (step if reverse else cost[j])
+                if dist[j] < 0 or tentative < dist[j]:
+                    dist[j] = tentative
+                    parent[j] = i
+                    push(tentative, j)
+        return reached, parent, settled
+
+    def path(self, parent, target):
+        # Cells from the search's source to target, source excluded
+        cells = self.cells
+        segment = []
+        i = self.local(target)
+        while parent[i] >= 0:
+            segment.append(cells[i])
+            i = parent[i]
+        segment.reverse()
+        return segment
+
+
+_graphs = weakref.WeakKeyDictionary()
+
+
+def cluster_graph(grid):
+    # The ClusterGraph kept for this grid's terrain, synced with its latest edits
+    grid = grid.terrain
+    graph = _graphs.get(grid)
+    if graph is None:
+        graph = _graphs[grid] = ClusterGraph(grid)
+    graph.sync()
+    return graph
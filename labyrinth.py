@@ -1,48 +1,405 @@
+from array import array
 import random
+from settings import *
+from compactgrid import CompactGrid
+from background import BackgroundTask
+from stepper import WAITING
 
-def generate_maze(grid):
+try:
+    import numpy as np
+except ImportError:  # Terrain noise falls back to plain Python
+    np = None
+
+# The perfect-maze generators carve passages between "node" cells at odd
+# (row, col) on the walkable array of any CompactGrid; everything else stays
+# a wall. All of them take (grid, rng) where rng is a random.Random, so a
+# seeded rng gives the same maze every time.
+
+
+def _open_nodes(grid):
+    # Walls everywhere except the node cells; returns the node rows and cols
+    rows, cols = grid.rows, grid.cols
+    walkable = grid.walkable
+    walkable[:] = bytes(grid.size)
+    node_rows, node_cols = rows // 2, cols // 2
+    pattern = (b"\x00\x01" * node_cols + b"\x00")[:cols]
+    for row in range(1, 2 * node_rows, 2):
+        walkable[row * cols:(row + 1) * cols] = pattern
+    return node_rows, node_cols
+
+
+def _padded_nodes(node_rows, node_cols, border):
+    # Node states with a one node border, so neighbors never need bounds checks.
+    # Node (i, j) is (i + 1) * (node_cols + 2) + j + 1.
+    width = node_cols + 2
+    state = bytearray([border]) * ((node_rows + 2) * width)
+    for i in range(1, node_rows + 1):
+        state[i * width + 1:i * width + 1 + node_cols] = bytes(node_cols)
+    return state
+
+
+def carve_backtracker(grid, rng=random):
+    # Recursive backtracker (depth-first): long winding corridors, few dead ends
+    node_rows, node_cols = _open_nodes(grid)
+    if node_rows and node_cols:
+        cols = grid.cols
+        walkable = grid.walkable
+        width = node_cols + 2
+        visited = _padded_nodes(node_rows, node_cols, 1)
+        moves = (1, -1, width, -width)
+        passage = {1: 1, -1: -1, width: cols, -width: -cols}  # Node step -> cell step
+        random_ = rng.random
+
+        node = (rng.randrange(node_rows) + 1) * width + rng.randrange(node_cols) + 1
+        visited[node] = 1
+        stack = [node]
+        while stack:
+            node = stack[-1]
+            options = [node + move for move in moves if not visited[node + move]]
+            if not options:
+                stack.pop()
+                continue
+            following = options[int(random_() * len(options))]
+            visited[following] = 1
+            row, col = divmod(following, width)
+            walkable[(2 * row - 1) * cols + 2 * col - 1 - passage[following - node]] = 1
+            stack.append(following)
+    grid.invalidate_neighbor_index()
+
+
+carve_maze = carve_backtracker
+
+
+def carve_kruskal(grid, rng=random):
+    # Randomized Kruskal: walls between nodes are removed in random order
+    # whenever they separate two trees (union-find with path halving)
+    node_rows, node_cols = _open_nodes(grid)
+    count = node_rows * node_cols
+    cols = grid.cols
+    walkable = grid.walkable
+    # Edge node * 2 joins the node with its right neighbor, node * 2 + 1 with the one below
+    edges = [2 * node for node in range(count) if node % node_cols != node_cols - 1]
+    edges += range(1, 2 * (count - node_cols), 2)
+    rng.shuffle(edges)
+    parent = list(range(count))
+    joins = count - 1
+    for edge in edges:
+        if joins <= 0:
+            break
+        node, down = edge >> 1, edge & 1
+        a = node
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        b = node + node_cols if down else node + 1
+        while parent[b] != b:
+            parent[b] = parent[parent[b]]
+            b = parent[b]
+        if a != b:
+            parent[a] = b
+            joins -= 1
+            row, col = divmod(node, node_cols)
+            walkable[(2 * row + 1) * cols + 2 * col + 1 + (cols if down else 1)] = 1
+    grid.invalidate_neighbor_index()
+
+
+def carve_prim(grid, rng=random):
+    # Randomized Prim: grows one tree from a random node, attaching a random
+    # frontier node each step; many short dead ends
+    node_rows, node_cols = _open_nodes(grid)
+    if node_rows and node_cols:
+        cols = grid.cols
+        walkable = grid.walkable
+        width = node_cols + 2
+        state = _padded_nodes(node_rows, node_cols, 3)  # 0 outside, 1 in the maze, 2 frontier, 3 border
+        moves = (1, -1, width, -width)
+        passage = {1: 1, -1: -1, width: cols, -width: -cols}
+        random_ = rng.random
+
+        node = (rng.randrange(node_rows) + 1) * width + rng.randrange(node_cols) + 1
+        frontier = []
+        while True:
+            state[node] = 1
+            for move in moves:
+                if not state[node + move]:
+                    state[node + move] = 2
+                    frontier.append(node + move)
+            if not frontier:
+                break
+            # Take a random frontier node (swap with the last for O(1) removal)
+            k = int(random_() * len(frontier))
+            node = frontier[k]
+            frontier[k] = frontier[-1]
+            frontier.pop()
+            options = [move for move in moves if state[node + move] == 1]
+            move = options[int(random_() * len(options))]
+            row, col = divmod(node, width)
+            walkable[(2 * row - 1) * cols + 2 * col - 1 + passage[move]] = 1
+    grid.invalidate_neighbor_index()
+
+
+def carve_wilson(grid, rng=random):
+    # Wilson's algorithm: loop-erased random walks give a uniformly random
+    # spanning tree (no bias), at the price of long walks early on
+    node_rows, node_cols = _open_nodes(grid)
+    if node_rows and node_cols:
+        cols = grid.cols
+        walkable = grid.walkable
+        width = node_cols + 2
+        state = _padded_nodes(node_rows, node_cols, 3)  # 0 outside, 1 in the tree, 3 border
+        moves = (1, -1, width, -width)
+        passage = {1: 1, -1: -1, width: cols, -width: -cols}
+        heading = bytearray(len(state))  # Last move taken out of each node by the current walk
+        random_ = rng.random
+
+        state[(rng.randrange(node_rows) + 1) * width + rng.randrange(node_cols) + 1] = 1
+        nodes = [i * width + j for i in range(1, node_rows + 1) for j in range(1, node_cols + 1)]
+        rng.shuffle(nodes)
+        for first in nodes:
+            if state[first]:
+                continue
+            # Walk until the tree is hit; overwriting headings erases the loops
+            node = first
+            while state[node] != 1:
+                k = int(random_() * 4)
+                if state[node + moves[k]] == 3:
+                    continue
+                heading[node] = k
+                node += moves[k]
+            # Retrace the loop-erased walk into the tree
+            node = first
+            while state[node] != 1:
+                state[node] = 1
+                move = moves[heading[node]]
+                row, col = divmod(node, width)
+                walkable[(2 * row - 1) * cols + 2 * col - 1 + passage[move]] = 1
+                node += move
+    grid.invalidate_neighbor_index()
+
+
+def eller_rows(cols, rng=random, rows=None):
+    # Eller's algorithm, one row of cells at a time: only the set labels of
+    # the current node row are kept, so mazes of any height can be streamed
+    # (e.g. written to a file) in O(cols) memory. Yields bytes rows of
+    # walkability. With rows=None it never ends; otherwise it yields exactly
+    # rows rows and the last node row joins every set, giving a perfect maze.
+    node_cols = cols // 2
+    node_rows = None if rows is None else rows // 2
+    random_ = rng.random
+    pattern = (b"\x00\x01" * node_cols + b"\x00")[:cols]
+    labels = [0] * node_cols
+    members = {}  # label -> node cols in the current row carrying it
+    next_label = 1
+    produced = 0
+    node_row = 0
+
+    if rows != 0:
+        yield bytes(cols)  # Top wall
+        produced = 1
+    while node_rows is None or node_row < node_rows:
+        last = node_row == node_rows - 1 if node_rows is not None else False
+        for j in range(node_cols):
+            if not labels[j]:
+                labels[j] = next_label
+                members[next_label] = [j]
+                next_label += 1
+
+        # Join neighbors from different sets at random (all of them in the last row)
+        row = bytearray(pattern)
+        for j in range(node_cols - 1):
+            a, b = labels[j], labels[j + 1]
+            if a != b and (last or random_() < 0.5):
+                row[2 * j + 2] = 1
+                kept, merged = members[a], members[b]
+                if len(kept) < len(merged):
+                    a, b, kept, merged = b, a, merged, kept
+                for k in merged:
+                    labels[k] = a
+                kept.extend(merged)
+                del members[b]
+        yield bytes(row)
+        produced += 1
+        node_row += 1
+        if last or produced == rows:
+            break
+
+        # Every set continues downwards at least once
+        below = bytearray(cols)
+        labels = [0] * node_cols
+        continuing = {}
+        for label, node_cols_in_set in members.items():
+            down = [j for j in node_cols_in_set if random_() < 0.5]
+            if not down:
+                down = [node_cols_in_set[int(random_() * len(node_cols_in_set))]]
+            for j in down:
+                below[2 * j + 1] = 1
+                labels[j] = label
+            continuing[label] = down
+        members = continuing
+        yield bytes(below)
+        produced += 1
+        if produced == rows:
+            break
+
+    while rows is not None and produced < rows:
+        yield bytes(cols)  # Bottom wall of odd heights
+        produced += 1
+
+
+def carve_eller(grid, rng=random):
+    cols = grid.cols
+    walkable = grid.walkable
+    for row, cells in enumerate(eller_rows(cols, rng, grid.rows)):
+        walkable[row * cols:(row + 1) * cols] = cells
+    grid.invalidate_neighbor_index()
+
+
+def scatter_obstacles(grid, rng=random, density=OBSTACLE_DENSITY):
+    # Every cell independently becomes a wall with probability density (in 1/256 steps)
+    threshold = int(density * 256)
+    grid.walkable[:] = rng.randbytes(grid.size).translate(bytes(threshold) + b"\x01" * (256 - threshold))
+    grid.invalidate_neighbor_index()
+
+
+def _smooth_steps(length, step):
+    # Lattice index and smoothstep weight of every position along one axis
+    starts = [position // step for position in range(length)]
+    weights = []
+    for position in range(length):
+        t = (position % step) / step
+        weights.append(t * t * (3 - 2 * t))
+    return starts, weights
+
+
+NOISE_CONTRAST = 2.0
+
+
+def _noise_offset(max_cost):
+    # Start value of the cost sum that keeps the stretched noise centred
+    return 1 + (1 - NOISE_CONTRAST) * max_cost / 2
+
+
+def noise_terrain(grid, rng=random, max_cost=TERRAIN_MAX_COST, scale=TERRAIN_SCALE, octaves=TERRAIN_OCTAVES):
+    # Weighted terrain without walls: value noise (random lattice values every
+    # scale cells, smoothly interpolated, octaves of halving size and weight)
+    # mapped to tile costs 1..max_cost. Averaged octaves bunch up around the
+    # middle, so the noise is stretched by NOISE_CONTRAST and clipped.
+    rows, cols = grid.rows, grid.cols
+    grid.walkable[:] = b"\x01" * grid.size
+    layers = []
+    total_weight = 0.0
+    for octave in range(octaves):
+        step = max(1, scale >> octave)
+        weight = 0.5 ** octave
+        lattice_rows, lattice_cols = rows // step + 2, cols // step + 2
+        lattice = rng.randbytes(lattice_rows * lattice_cols)
+        layers.append((step, weight, lattice_rows, lattice_cols, lattice))
+        total_weight += weight
+
+    if np is not None:
+        _noise_costs_numpy(grid, layers, total_weight, max_cost)
+    else:
+        _noise_costs(grid, layers, total_weight, max_cost)
+    grid.invalidate_neighbor_index()
+
+
+def _noise_costs(grid, layers, total_weight, max_cost):
+    rows, cols = grid.rows, grid.cols
+    cost = grid.cost
+    interpolated = []
+    for step, weight, lattice_rows, lattice_cols, lattice in layers:
+        # Interpolate every lattice row across the columns once
+        starts, weights = _smooth_steps(cols, step)
+        scale = NOISE_CONTRAST * weight * max_cost / (255 * total_weight)
+        across = []
+        for i in range(lattice_rows):
+            values = lattice[i * lattice_cols:(i + 1) * lattice_cols]
+            across.append([(values[c] + (values[c + 1] - values[c]) * t) * scale for c, t in zip(starts, weights)])
+        interpolated.append((_smooth_steps(rows, step), across))
+
+    for row in range(rows):
+        total = [_noise_offset(max_cost)] * cols
+        for (row_starts, row_weights), across in interpolated:
+            above, below, t = across[row_starts[row]], across[row_starts[row] + 1], row_weights[row]
+            total = [value + a + (b - a) * t for value, a, b in zip(total, above, below)]
+        cost[row * cols:(row + 1) * cols] = array("H", [min(max(int(value), 1), max_cost) for value in total])
+
+
+def _noise_costs_numpy(grid, layers, total_weight, max_cost):
+    rows, cols = grid.rows, grid.cols
+    cost = np.frombuffer(grid.cost, dtype=np.uint16).reshape(rows, cols)
+    interpolated = []
+    for step, weight, lattice_rows, lattice_cols, lattice in layers:
+        values = np.frombuffer(lattice, dtype=np.uint8).reshape(lattice_rows, lattice_cols).astype(np.float32)
+        values *= NOISE_CONTRAST * weight * max_cost / (255 * total_weight)
+        starts, weights = _smooth_steps(cols, step)
+        starts, weights = np.array(starts), np.array(weights, dtype=np.float32)
+        across = values[:, starts] + (values[:, starts + 1] - values[:, starts]) * weights
+        row_starts, row_weights = _smooth_steps(rows, step)
+        interpolated.append((np.array(row_starts), np.array(row_weights, dtype=np.float32)[:, None], across))
+
+    chunk = max(1, (1 << 20) // max(cols, 1))  # Rows per pass, bounding the float buffers
+    for first in range(0, rows, chunk):
+        last = min(rows, first + chunk)
+        total = np.full((last - first, cols), _noise_offset(max_cost), dtype=np.float32)
+        for row_starts, row_weights, across in interpolated:
+            above, below = across[row_starts[first:last]], across[row_starts[first:last] + 1]
+            total += above + (below - above) * row_weights[first:last]
+        cost[first:last] = np.clip(total, 1, max_cost)
+
+
+GENERATORS = {
+    "backtracker": carve_backtracker,
+    "kruskal": carve_kruskal,
+    "prim": carve_prim,
+    "wilson": carve_wilson,
+    "eller": carve_eller,
+    "obstacles": scatter_obstacles,
+    "terrain": noise_terrain,
+}
+
+
+def maze_rng(seed=None):
+    # A seeded generator plus the seed, printed so that a maze can be reproduced
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    return random.Random(seed), seed
+
+
+def generate_maze(grid, rng=random, algorithm=MAZE_ALGORITHM):
     grid.clear()
     grid.reset_changed_flag()
+    GENERATORS[algorithm](grid, rng)
+    grid.start_id = grid.end_id = -1  # The old start and goal may be walls now
+    grid.recolor_from_terrain()
+    grid.changed = True
 
-    stack = []
-
-    # Fill all tiles with walls first
-    for row in grid.tiles:
-        for tile in row:
-            tile.set_blocked()
-
-    # Pick a random starting point (odd row and col)
-    start_row = random.randrange(1, grid.rows, 2)
-    start_col = random.randrange(1, grid.cols, 2)
-    start_tile = grid.tiles[start_row][start_col]
-    start_tile.set_clear()
-
-    stack.append(start_tile)
-
-    while stack:
-        current = stack[-1]
-        row, col = current.row, current.col
-
-        # Check for unvisited neighbors 2 steps away
-        neighbors = []
-        directions = [(-2, 0), (2, 0), (0, -2), (0, 2)]
-        for drow, dcol in directions:
-            nrow, ncol = row + drow, col + dcol
-            if 0 <= nrow < grid.rows and 0 <= ncol < grid.cols:
-                neighbor = grid.tiles[nrow][ncol]
-                if not neighbor.walkable:  # Still a wall => unvisited
-                    neighbors.append((neighbor, drow, dcol))
-
-        if neighbors:
-            neighbor, drow, dcol = random.choice(neighbors)
-            # Carve path between current and neighbor
-            wall_row = row + drow // 2
-            wall_col = col + dcol // 2
-            grid.tiles[wall_row][wall_col].set_clear()
-            neighbor.set_clear()
-            stack.append(neighbor)
-        else:
-            stack.pop()
 
-    grid.changed = True
+def maze_job(events, cancelled, rows, cols, algorithm=MAZE_ALGORITHM, seed=None):
+    # Runs in a background worker on a scratch grid and sends back the terrain
+    scratch = CompactGrid(rows, cols)
+    GENERATORS[algorithm](scratch, random.Random(seed))
+    events.put(("maze", bytes(scratch.walkable), scratch.cost))
+
+
+def background_maze_generator(grid, mode, algorithm=MAZE_ALGORITHM, seed=None):
+    task = BackgroundTask(maze_job, (grid.rows, grid.cols, algorithm, seed), mode)
+    try:
+        message = task.poll()
+        while message is None:
+            yield WAITING
+            message = task.poll()
+    finally:
+        task.cancel()
+    if message[0] == "error":
+        print("Maze generation failed:", message[1])
+        return
 
+    grid.clear()
+    grid.reset_changed_flag()
+    grid.walkable[:] = message[1]
+    grid.cost[:] = message[2]
+    grid.start_id = grid.end_id = -1  # The old start and goal may be walls now
+    grid.invalidate_neighbor_index()
+    grid.recolor_from_terrain()
+    grid.changed = True
@@ -0,0 +1,97 @@
+from array import array
+import weakref
+from components import components
+from distcache import UNIT, WEIGHTED, build_tree
+from settings import *
+
+
+class Landmarks:
+    # ALT lower bounds (A*, Landmarks, Triangle inequality). Distances from a
+    # few landmark cells are kept in one array each. Entering a tile costs its
+    # weight, so a path and its reverse differ only in their end tiles:
+    # d(v, u) = d(u, v) + cost[u] - cost[v]. With dist = d(L, .) that bounds
+    # d(n, t) from below by both dist[t] - dist[n] and
+    # dist[n] - cost[n] - dist[t] + cost[t], and the largest bound over the
+    # landmarks is a consistent heuristic.
+
+    def __init__(self, grid, count=LANDMARK_COUNT, max_bytes=LANDMARK_MAX_BYTES):
+        self.grid = grid
+        self.count = count
+        self.max_bytes = max_bytes
+        self.cells = []
+        self.dist = []  # array("i") of d(landmark, cell) per landmark, -1 where unreachable
+        self.version = None  # Grid version the distances match, None before the first build
+
+    def sync(self):
+        # Distances cannot be patched cheaply after an edit, so they are
+        # recomputed, but only when a search asks for them
+        if self.version != self.grid.version:
+            self.build()
+
+    def build(self):
+        # Farthest-point selection: each landmark is the cell whose distance
+        # to the nearest landmark picked so far is largest, all in the
+        # biggest connected region
+        grid = self.grid
+        self.cells = []
+        self.dist = []
+        count = min(self.count, self.max_bytes // (4 * grid.size))
+        seed = components(grid).largest()
+        if seed >= 0 and count > 0:
+            model = UNIT if grid.uniform_cost() else WEIGHTED
+            nearest = build_tree(grid, seed, model).dist
+            while len(self.cells) < count:
+                farthest = max(nearest)
+                if farthest <= 0:
+                    break  # Every cell of the region is a landmark already
+                landmark = nearest.index(farthest)
+                dist = build_tree(grid, landmark, model).dist
+                self.cells.append(landmark)
+                self.dist.append(dist)
+                # The seed only found the first landmark, it is not one itself
+                nearest = dist if len(self.cells) == 1 else array("i", map(min, nearest, dist))
+        self.version = grid.version
+
+    def heuristic(self, start, goal, active=ACTIVE_LANDMARKS):
+        # h(cell) bounding the cost from cell to goal. Only the active
+        # landmarks giving the best bounds at start are consulted.
+        cost = self.grid.cost
+        goal_cost = cost[goal]
+        bounds = []
+        for dist in self.dist:
+            to_goal = dist[goal]
+            if to_goal < 0 or dist[start] < 0:
+                continue  # The landmark lies in another region
+            back = to_goal - goal_cost
+            at_start = max(to_goal - dist[start], dist[start] - cost[start] - back)
+            bounds.append((at_start, dist, to_goal, back))
+        bounds.sort(key=lambda bound: bound[0], reverse=True)
+        terms = [(dist, to_goal, back) for _, dist, to_goal, back in bounds[:active]]
+
+        def h(cell):
+            best = 0
+            step = cost[cell]
+            for dist, to_goal, back in terms:
+                d = dist[cell]
+                if to_goal - d > best:
+                    best = to_goal - d
+                if d - step - back > best:
+                    best = d - step - back
+            return best
+        return h
+
+    def nbytes(self):
+        return sum(dist.itemsize * len(dist) for dist in self.dist)
+
+
+_landmarks = weakref.WeakKeyDictionary()
+
+
+def landmarks(grid):
+    # The Landmarks kept for this grid's terrain, recomputed if it changed since
+    grid = grid.terrain
+    found = _landmarks.get(grid)
+    if found is None:
+        found = _landmarks[grid] = Landmarks(grid)
+    found.sync()
+    return found
@@ -0,0 +1,163 @@
+from array import array
+import heapq
+import math
+from movement import DIRECTIONS
+from components import connected
+from search import VISIT, astar_search, neighbor_index
+
+INF = math.inf
+
+
+class LPAStar:
+    # Lifelong Planning A* between a fixed start and goal. The g/rhs values and
+    # the open queue survive between calls to replan(), which only repairs the
+    # part of the shortest-path tree affected by cells edited in the meantime.
+    # Keys and edits assume straight steps, so 8-connected grids use A*.
+
+    def __init__(self, grid, start, goal):
+        self.grid = grid
+        self.start = start
+        self.goal = goal
+        self.goal_row, self.goal_col = divmod(goal, grid.cols)
+        self.stats = None  # metrics.SearchStats of the compute() in progress
+        self.reset()
+
+    def reset(self):
+        size = self.grid.size
+        self.g = array("d", [INF]) * size
+        self.rhs = array("d", [INF]) * size
+        self.queue = []
+        self.queued = {}  # cell -> key it is queued with; heap entries with other keys are stale
+        self.version = self.grid.version
+        if self.grid.walkable[self.start]:
+            self.rhs[self.start] = 0
+            self._push(self.start)
+
+    def matches(self, start, goal):
+        return self.start == start and self.goal == goal
+
+    def _key(self, cell):
+        best = min(self.g[cell], self.rhs[cell])
+        row, col = divmod(cell, self.grid.cols)
+        return (best + abs(row - self.goal_row) + abs(col - self.goal_col), best)
+
+    def _push(self, cell):
+        key = self._key(cell)
+        self.queued[cell] = key
+        heapq.heappush(self.queue, (key[0], key[1], cell))
+        if self.stats is not None:
+            self.stats.pushes += 1
+
+    def _top(self):
+        queue = self.queue
+        while queue:
+            k1, k2, cell = queue[0]
+            if self.queued.get(cell) == (k1, k2):
+                return queue[0]
+            heapq.heappop(queue)
+            if self.stats is not None:
+                self.stats.pops += 1
+                self.stats.stale += 1
+        return None
+
+    def _update_vertex(self, cell, offsets, adj, degree):
+        if cell != self.start:
+            if self.grid.walkable[cell]:
+                # Entering a tile costs its weight, whichever neighbour we come from
+                g = self.g
+                base = offsets[cell]
+                best = min((g[adj[k]] for k in range(base, base + degree[cell])), default=INF)
+                self.rhs[cell] = best + self.grid.cost[cell]
+            else:
+                self.rhs[cell] = INF
+        self.queued.pop(cell, None)
+        if self.g[cell] != self.rhs[cell]:
+            self._push(cell)
+
+    def apply_changes(self, cells):
+        # An edited cell changes the cost of entering it and, if its walkability
+        # flipped, which edges leave it, so it and its neighbours are updated
+        grid = self.grid
+        offsets, adj, degree = grid.neighbor_index()
+        affected = set()
+        for cell in cells:
+            affected.add(cell)
+            row, col = divmod(cell, grid.cols)
+            for drow, dcol in DIRECTIONS:
+                if grid.in_bounds(row + drow, col + dcol):
+                    affected.add(cell + drow * grid.cols + dcol)
+        for cell in affected:
+            self._update_vertex(cell, offsets, adj, degree)
+
+    def sync(self):
+        cells = self.grid.changed_cells(self.version)
+        if cells is None or self.start in cells:
+            self.reset()
+        else:
+            self.apply_changes(cells)
+        self.version = self.grid.version
+
+    def compute(self, mark=None, stats=None):
+        # Generator in the style of search.py: yields per expansion only when marking
+        offsets, adj, degree = neighbor_index(self.grid, stats)
+        g, rhs = self.g, self.rhs
+        goal = self.goal
+        expanded = 0
+        self.stats = stats
+        try:
+            while True:
+                top = self._top()
+                if top is None or ((top[0], top[1]) >= self._key(goal) and rhs[goal] == g[goal]):
+                    break
+                heapq.heappop(self.queue)
+                cell = top[2]
+                del self.queued[cell]
+                expanded += 1
+                if stats is not None:
+                    stats.pops += 1
+                    stats.expand(cell, len(self.queued))
+
+                if g[cell] > rhs[cell]:
+                    g[cell] = rhs[cell]
+                else:
+                    g[cell] = INF
+                    self._update_vertex(cell, offsets, adj, degree)
+                base = offsets[cell]
+                for k in range(base, base + degree[cell]):
+                    self._update_vertex(adj[k], offsets, adj, degree)
+
+                if mark is not None:
+                    mark(VISIT, cell)
+                    yield
+        finally:
+            self.stats = None
+        return self.path(), expanded
+
+    def replan(self, mark=None, stats=None):
+        if self.grid.movement.diagonal:
+            # Not synced: switching movement back empties the change log, so
+            # the next 4-connected replan starts over from reset()
+            return (yield from astar_search(self.grid, self.start, self.goal, mark, stats))
+        self.stats = stats  # The repair's pushes count too
+        self.sync()
+        self.stats = None
+        if not connected(self.grid, self.start, self.goal):
+            return None, 0
+        return (yield from self.compute(mark, stats))
+
+    def path(self):
+        if self.g[self.goal] == INF:
+            return None
+        offsets, adj, degree = self.grid.neighbor_index()
+        g = self.g
+        path = [self.goal]
+        current = self.goal
+        while current != self.start:
+            if len(path) > self.grid.size:
+                return None  # The g values do not lead back to the start
+            base = offsets[current]
+            current = min((adj[k] for k in range(base, base + degree[current])), key=g.__getitem__)
+            path.append(current)
+        path.reverse()
+        return path
+
@@ -5,12 +5,32 @@ from visualizer import Visualizer
 from button import Button
 from algorithms import *
 from mazeJSON import *
+from mazeBinary import export_maze_to_binary, load_maze_from_binary
 from labyrinth import *
+from lpastar import LPAStar
+from stepper import Stepper
+from background import THREAD, PROCESS
+from search import HEURISTICS, HEURISTIC_SEARCHES, SEARCHES, heuristic_name
+from movement import MOVEMENTS
+from searchtrace import TracePlayer, TraceRecorder, load_trace, save_trace
+from timeline import Timeline
+from race import Race, LOCKSTEP, WALL_CLOCK
+from metrics import FINISH, SearchStats, export_records
 
 pygame.init()
 
-algorithm_generator = None
+stepper = Stepper()  # Advances the running algorithm each frame
+recorder = None  # Trace of the last run, saved with 'T'
+stats = None  # Counters of the current or last run, shown in the description bar
+run_records = []  # Records of the finished runs, exported with 'X'
+planner = None  # Kept between runs in LPA* mode so edits can be repaired incrementally
 algorithm_mode = "BFS"
+search_worker = SEARCH_WORKER
+race = None  # Side-by-side views replacing the grid while racing
+race_algorithms = list(RACE_ALGORITHMS)
+race_mode = RACE_MODE
+maze_algorithm = MAZE_ALGORITHM
+full_redraw = True  # Repaint the whole window on the next frame
 current_mode = "block"
 
 font = pygame.font.SysFont("Arial", 28)
@@ -22,7 +42,6 @@ clock = pygame.time.Clock()
 grid = Grid()
 visualizer = Visualizer(grid)
 
-last_step_time = pygame.time.get_ticks()  # Initialize last_step_time
 
 
 def set_mode_start():
@@ -44,9 +63,15 @@ def set_mode_block():
 
 
 def on_algorithm_button_clicked(selected_button):
-    if selected_button.text not in ["BFS", "DFS", "A*", "IDDFS", "FRINGE", "GREEDY BFS", "BIDIRECT BFS"]:
+    if selected_button.text not in ["BFS", "DFS", "A*", "JPS", "IDDFS", "LPA*", "FRINGE", "HPA*", "GREEDY BFS", "BIDIRECT BFS"]:
         return
-    for button in [button_bfs, button_dfs, button_astar, button_iddfs, button_fringe, button_greedy, button_bidirectional]:
+    if pygame.key.get_mods() & pygame.KMOD_SHIFT:  # Shift+click picks the algorithms to race
+        if algorithm_mode in race_algorithms:
+            race_algorithms.remove(algorithm_mode)
+        elif algorithm_mode in SEARCHES:
+            race_algorithms.append(algorithm_mode)
+        print("Race:", ", ".join(race_algorithms))
+    for button in [button_bfs, button_dfs, button_astar, button_jps, button_iddfs, button_lpastar, button_fringe, button_hpastar, button_greedy, button_bidirectional]:
         button.is_active = False  # Deactivate other algorithm buttons
     selected_button.is_active = True  # Set the selected button to active
 
@@ -70,18 +95,36 @@ def set_astar():
     on_algorithm_button_clicked(button_astar)
 
 
+def set_jps():
+    global algorithm_mode
+    algorithm_mode = "JPS"
+    on_algorithm_button_clicked(button_jps)
+
+
 def set_iddfs():
     global algorithm_mode
     algorithm_mode = "IDDFS"
     on_algorithm_button_clicked(button_iddfs)
 
 
+def set_lpastar():
+    global algorithm_mode
+    algorithm_mode = "LPA*"
+    on_algorithm_button_clicked(button_lpastar)
+
+
 def set_fringe():
     global algorithm_mode
     algorithm_mode = "FRINGE"
     on_algorithm_button_clicked(button_fringe)
 
 
+def set_hpastar():
+    global algorithm_mode
+    algorithm_mode = "HPA*"
+    on_algorithm_button_clicked(button_hpastar)
+
+
 def set_greedy():
     global algorithm_mode
     algorithm_mode = "GREEDY"
@@ -95,27 +138,56 @@ def set_bidirectional():
 
 
 def run_algorithm():
-    global algorithm_generator
+    global planner, recorder, stats
+    stop_race()
     grid.clear_path()
-
-    if algorithm_mode == "BFS":
-        algorithm_generator = bfs_generator(grid)
+    timeline.player = None
+    recorder = TraceRecorder(grid, algorithm_mode)
+    stats = SearchStats(algorithm_mode)
+    stats.subscribe(FINISH, run_records.append)
+
+    if search_worker and algorithm_mode in SEARCHES and algorithm_mode != "HPA*":
+        # Search in a worker so the window stays responsive; events are replayed.
+        # HPA* runs here: its cluster graph lives with this grid, a worker's copy would rebuild it.
+        algorithm_generator = background_generator(grid, algorithm_mode, algorithm_mode, search_worker, recorder, stats)
+    elif algorithm_mode == "BFS":
+        algorithm_generator = bfs_generator(grid, recorder, stats)
     elif algorithm_mode == "DFS":
-        algorithm_generator = dfs_generator(grid)
+        algorithm_generator = dfs_generator(grid, recorder, stats)
     elif algorithm_mode == "A*":
-        algorithm_generator = astar_generator(grid)
+        algorithm_generator = astar_generator(grid, recorder, stats)
+    elif algorithm_mode == "JPS":
+        algorithm_generator = jps_generator(grid, recorder, stats)
     elif algorithm_mode == "IDDFS":
-        algorithm_generator = iddfs_generator(grid)
+        algorithm_generator = iddfs_generator(grid, recorder, stats)
+    elif algorithm_mode == "LPA*":
+        if grid.start_id >= 0 and grid.end_id >= 0:
+            if planner is None or not planner.matches(grid.start_id, grid.end_id):
+                planner = LPAStar(grid, grid.start_id, grid.end_id)
+        algorithm_generator = lpastar_generator(grid, planner, recorder, stats)
+        grid.reset_changed_flag()
     elif algorithm_mode == "FRINGE":
-        algorithm_generator = fringe_generator(grid)
+        algorithm_generator = fringe_generator(grid, recorder, stats)
+    elif algorithm_mode == "HPA*":
+        algorithm_generator = hpastar_generator(grid, recorder, stats)
     elif algorithm_mode == "GREEDY":
-        algorithm_generator = greedybfs_generator(grid)
+        algorithm_generator = greedybfs_generator(grid, recorder, stats)
     elif algorithm_mode == "BIDIRECTIONAL":
-        algorithm_generator = bidirectional_bfs_generator(grid)
+        algorithm_generator = bidirectional_bfs_generator(grid, recorder, stats)
     elif algorithm_mode == "STOP":
         algorithm_generator = None
+        recorder = None
+        stats = None
     else:
         return
+    stepper.start(algorithm_generator, pygame.time.get_ticks())
+
+
+def run_distance_field():
+    stop_race()
+    grid.clear_path()
+    timeline.player = None
+    stepper.start(distance_field_generator(grid), pygame.time.get_ticks())
 
 
 def on_algorithm_selected(name):
@@ -126,13 +198,151 @@ def on_algorithm_selected(name):
 
 def clear_grid():
     global grid
+    stop_race()
     grid.clear()
     global algorithm_mode
     algorithm_mode = "STOP"
     run_algorithm()
 
+def load_grid(load=load_maze_from_json):
+    stop_race()
+    try:
+        load(grid)
+    except (OSError, ValueError) as error:
+        print(f"Could not load maze: {error}")
+
+
+def generate_labyrinth():
+    stop_race()
+    rng, seed = maze_rng(MAZE_SEED)
+    print(f"Generating {maze_algorithm} maze, seed {seed}")
+    if search_worker:
+        stepper.start(background_maze_generator(grid, search_worker, maze_algorithm, seed))
+    else:
+        generate_maze(grid, rng, maze_algorithm)
+
+
+def cycle_maze_algorithm():
+    global maze_algorithm
+    names = list(GENERATORS)
+    maze_algorithm = names[(names.index(maze_algorithm) + 1) % len(names)]
+    print("LABYRINTH generates:", maze_algorithm)
+
+
+def cycle_movement():
+    stop_race()
+    names = list(MOVEMENTS)
+    grid.set_movement(names[(names.index(grid.movement.name) + 1) % len(names)])
+    print("Moves:", grid.movement.description)
+
+
+def cycle_heuristic():
+    if algorithm_mode not in HEURISTIC_SEARCHES:
+        print(f"{algorithm_mode} uses no heuristic.")
+        return
+    names = list(HEURISTICS)
+    name = names[(names.index(heuristic_name(grid, algorithm_mode)) + 1) % len(names)]
+    ALGORITHM_HEURISTICS[algorithm_mode] = name
+    print(f"{algorithm_mode} heuristic:", name)
+
+
+def change_weight(step):
+    # Steps the weighted A* factor of the selected algorithm through HEURISTIC_WEIGHT_STEPS
+    if algorithm_mode not in ("A*", "FRINGE"):
+        print(f"{algorithm_mode} takes no heuristic weight.")
+        return
+    weight = HEURISTIC_WEIGHTS.get(algorithm_mode, 1)
+    if step > 0:
+        weight = next((w for w in HEURISTIC_WEIGHT_STEPS if w > weight), weight)
+    else:
+        weight = next((w for w in reversed(HEURISTIC_WEIGHT_STEPS) if w < weight), weight)
+    HEURISTIC_WEIGHTS[algorithm_mode] = weight
+    print(f"{algorithm_mode} heuristic weight:", weight)
+
+
+def cycle_search_worker():
+    global search_worker
+    workers = [None, THREAD, PROCESS]
+    search_worker = workers[(workers.index(search_worker) + 1) % len(workers)]
+    print("Searches run in:", search_worker or "main loop")
+
+
+def save_last_trace():
+    if recorder is None or not recorder.events:
+        print("No run recorded yet.")
+        return
+    save_trace(recorder.finish())
+
+
+def replay_trace():
+    stop_race()
+    try:
+        player = TracePlayer(grid, load_trace())
+    except (OSError, ValueError) as error:
+        print(f"Could not load trace: {error}")
+        return
+    timeline.player = player
+    stepper.start(player.playback(), pygame.time.get_ticks())
+
+
+def step_back():
+    if timeline.player is not None:
+        stepper.paused = True
+        timeline.player.seek(timeline.player.position - 1)
+        show_speed()
+
+
+def start_race():
+    global race, full_redraw
+    algorithms = [name for name in race_algorithms if name in SEARCHES]
+    if grid.start_id < 0 or grid.end_id < 0:
+        print("Start or end not set!")
+        return
+    if not algorithms:
+        print("No algorithms selected for the race.")
+        return
+    timeline.player = None
+    race = Race(grid, algorithms, visualizer.area, race_mode)
+    stepper.start(race.rounds(), pygame.time.get_ticks())
+    full_redraw = True
+
+
+def stop_race():
+    global race, full_redraw
+    if race is not None:
+        stepper.stop()
+        race = None
+        full_redraw = True  # Show the grid again
+
+
+def toggle_race_mode():
+    global race_mode
+    race_mode = WALL_CLOCK if race_mode == LOCKSTEP else LOCKSTEP
+    if race is not None:
+        race.mode = race_mode
+    print("Race views advance in", race_mode)
+
+
+def show_speed():
+    status = stepper.describe()
+    print("Animation speed:", status)
+    pygame.display.set_caption(f"Algorithm Visualizer - {status}")
+
+
 def get_description():
-    print("Hello world")
+    # The bar shows a summary of the last run; clicking it prints every counter
+    if stats is None:
+        print("No run yet.")
+    else:
+        print(stats.record())
+
+
+def export_run_records():
+    if not run_records:
+        print("No finished runs to export.")
+        return
+    export_records(run_records)
+    run_records.clear()
 
 button_width = 140
 button_height = 30
@@ -149,23 +359,30 @@ button_end = Button("Set Goal", start_x + (button_width + spacing) * 1, y_pos +
 button_block = Button("Block Mode", start_x + (button_width + spacing) * 2, y_pos + 20, button_width, button_height, set_mode_block)
 button_run = Button("Run (Enter)", start_x + (button_width + spacing) * 3, y_pos + 4 * button_height - 20, button_width, button_height, run_algorithm)
 button_save = Button("Save Grid", start_x + (button_width + spacing) * 4, y_pos + 20, button_width, button_height, lambda: export_maze_to_json(grid))
-button_load = Button("Load Grid", start_x + (button_width + spacing) * 4, y_pos + 2 * button_height, button_width, button_height, lambda: load_maze_from_json(grid))
+button_load = Button("Load Grid", start_x + (button_width + spacing) * 4, y_pos + 2 * button_height, button_width, button_height, load_grid)
 button_clear = Button("Clear Grid", start_x + (button_width + spacing) * 4, y_pos + 4 * button_height - 20, button_width, button_height, clear_grid)
 
 button_bfs = Button("BFS", start_x, y_pos + 2 * button_height, button_width, button_height, set_bfs)
 button_dfs = Button("DFS", start_x + (button_width + spacing) * 1, y_pos + 2 * button_height, button_width, button_height, set_dfs)
-button_astar = Button("A*", start_x + (button_width + spacing) * 2, y_pos + 2 * button_height, button_width, button_height, set_astar)
-button_iddfs = Button("IDDFS", start_x + (button_width + spacing) * 3, y_pos + 2 * button_height, button_width, button_height, set_iddfs)
-button_fringe = Button("FRINGE", start_x, y_pos + 4 * button_height - 20, button_width, button_height, set_fringe)
+# A*/JPS and IDDFS/LPA* share one slot each
+half_width = (button_width - spacing // 2) // 2
+button_astar = Button("A*", start_x + (button_width + spacing) * 2, y_pos + 2 * button_height, half_width, button_height, set_astar)
+button_jps = Button("JPS", start_x + (button_width + spacing) * 2 + button_width - half_width, y_pos + 2 * button_height, half_width, button_height, set_jps)
+button_iddfs = Button("IDDFS", start_x + (button_width + spacing) * 3, y_pos + 2 * button_height, half_width, button_height, set_iddfs)
+button_lpastar = Button("LPA*", start_x + (button_width + spacing) * 3 + button_width - half_width, y_pos + 2 * button_height, half_width, button_height, set_lpastar)
+button_fringe = Button("FRINGE", start_x, y_pos + 4 * button_height - 20, half_width, button_height, set_fringe)
+button_hpastar = Button("HPA*", start_x + button_width - half_width, y_pos + 4 * button_height - 20, half_width, button_height, set_hpastar)
 button_greedy = Button("GREEDY BFS", start_x + (button_width + spacing) * 1, y_pos + 4 * button_height - 20, button_width, button_height, set_greedy)
 button_bidirectional = Button("BIDIRECT BFS", start_x + (button_width + spacing) * 2, y_pos + 4 * button_height - 20, button_width, button_height, set_bidirectional)
 
-button_labyrinth = Button("LABYRINTH", start_x + (button_width + spacing) * 3, y_pos + 20, button_width, button_height, lambda: generate_maze(grid))
+button_labyrinth = Button("LABYRINTH", start_x + (button_width + spacing) * 3, y_pos + 20, button_width, button_height, generate_labyrinth)
 
 
+timeline = Timeline(start_x, y_pos + 4, total_width, 10)  # Shown while a trace is replayed
+
 button_decription = Button("Visualizer Description", start_x, y_pos + 5 * button_height - 10, button_width * 5 + 80, button_height, get_description)
 
-buttons = [button_start, button_end, button_block, button_run, button_bfs, button_dfs, button_astar, button_iddfs, button_fringe,
+buttons = [button_start, button_end, button_block, button_run, button_bfs, button_dfs, button_astar, button_jps, button_iddfs, button_lpastar, button_fringe, button_hpastar,
            button_save, button_load, button_clear, button_decription, button_greedy, button_bidirectional, button_labyrinth]
 
 # Dropdown next to the last button
@@ -180,8 +397,12 @@ while running:
 
     for event in pygame.event.get():
 
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            full_redraw = True
+
         for button in buttons:
             button.handle_event(event)
+        timeline.handle_event(event)
 
         if event.type == pygame.QUIT:
             running = False
@@ -189,9 +410,10 @@ while running:
         if event.type == pygame.MOUSEBUTTONDOWN:
             mouse_pos = pygame.mouse.get_pos()
 
-            if pygame.key.get_mods() & pygame.KMOD_CTRL:
+            # Race views share the maze's walkable and cost arrays, so it is not edited during a race
+            if race is None and pygame.key.get_mods() & pygame.KMOD_CTRL:
                 grid.set_cost_tile(mouse_pos)  # Set costly tile with Ctrl+Click
-            elif mouse_pos[1] < GRID_ROWS * TILE_SIZE:
+            elif race is None and mouse_pos[1] < grid.rows * grid.tile_size:
                 if current_mode == "start":
                     grid.set_start(mouse_pos)
                 elif current_mode == "end":
@@ -205,34 +427,99 @@ while running:
             if event.key == pygame.K_e:  # Press 'e' to export the maze to JSON
                 export_maze_to_json(grid)
             elif event.key == pygame.K_l:  # Press 'l' to load the maze from JSON
-                load_maze_from_json(grid)
+                load_grid()
+            elif event.key == pygame.K_b:  # Press 'b' to export the maze in the binary format
+                export_maze_to_binary(grid)
+            elif event.key == pygame.K_o:  # Press 'o' to load the binary maze
+                load_grid(load_maze_from_binary)
+            elif event.key == pygame.K_UP:  # Up / Down change the animation speed
+                stepper.faster()
+                show_speed()
+            elif event.key == pygame.K_DOWN:
+                stepper.slower()
+                show_speed()
+            elif event.key == pygame.K_SPACE:  # Space pauses and resumes
+                stepper.toggle_pause()
+                show_speed()
+            elif event.key == pygame.K_RIGHT:  # Right arrow advances a single step
+                stepper.step_once()
+                show_speed()
+            elif event.key == pygame.K_f:  # Press 'f' to finish the search at once
+                stepper.finish()
+            elif event.key == pygame.K_ESCAPE and stepper.running:  # Escape cancels the run
+                stepper.stop()
+                print("Run cancelled.")
+            elif event.key == pygame.K_LEFT:  # Left arrow steps a replayed trace back
+                step_back()
+            elif event.key == pygame.K_t:  # Press 't' to save the last run as trace.bin
+                save_last_trace()
+            elif event.key == pygame.K_y:  # Press 'y' to replay trace.bin
+                replay_trace()
+            elif event.key == pygame.K_r:  # Press 'r' to race the selected algorithms side by side
+                if race is None:
+                    start_race()
+                else:
+                    stop_race()
+            elif event.key == pygame.K_m:  # Press 'm' to switch race timing
+                toggle_race_mode()
+            elif event.key == pygame.K_w:  # Press 'w' to switch between main loop, thread and process
+                cycle_search_worker()
+            elif event.key == pygame.K_g:  # Press 'g' to switch the LABYRINTH generator
+                cycle_maze_algorithm()
+            elif event.key == pygame.K_x:  # Press 'x' to append the finished runs' metrics to metrics.jsonl
+                export_run_records()
+            elif event.key == pygame.K_n:  # Press 'n' to switch between 4- and 8-connected moves
+                cycle_movement()
+            elif event.key == pygame.K_h:  # Press 'h' to switch the selected algorithm's heuristic
+                cycle_heuristic()
+            elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):  # '+' / '-' change its weight
+                change_weight(1)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                change_weight(-1)
+            elif event.key == pygame.K_d:  # Press 'd' to color every tile by its distance from the start
+                run_distance_field()
 
         # Handle dropdown events
         #dropdown_algo.handle_event(event)
 
-    # Draw everything
-    screen.fill(CHARCOAL)
-    visualizer.draw(screen)
+    # A replay scrubbed back after it finished continues from the new position
+    if timeline.player is not None and not stepper.running and timeline.player.position < len(timeline.player.trace):
+        stepper.start(timeline.player.playback(), pygame.time.get_ticks())
 
-    for button in buttons:
-        button.draw(screen)
-
-
-    #dropdown_algo.draw(screen)
+    # Incremental mode repairs the previous plan as soon as the grid is edited
+    if algorithm_mode == "LPA*" and planner is not None and grid.changed and not stepper.running:
+        run_algorithm()
 
     # Algorithm step-by-step execution
-    if algorithm_generator:
-        now = pygame.time.get_ticks()
-        if now - last_step_time >= STEP_DELAY:
-            try:
-                next(algorithm_generator)  # Advance one step
-                last_step_time = now
+    stepper.update(pygame.time.get_ticks())
+
+    # Draw only what changed; the screen surface keeps everything else
+    if full_redraw:
+        screen.fill(CHARCOAL)
+        grid.redraw_all = True
+        if race is not None:
+            race.redraw()
+        for button in buttons:
+            button.drawn_color = None
+        timeline.drawn = None
+    dirty_rects = race.draw(screen) if race is not None else visualizer.draw(screen)
+    rect = timeline.refresh(screen)
+    if rect:
+        dirty_rects.append(rect)
+
+    button_decription.label = stats.summary() if stats is not None else button_decription.text
+    for button in buttons:
+        rect = button.refresh(screen)
+        if rect:
+            dirty_rects.append(rect)
 
-            except StopIteration:
-                algorithm_generator = None  # Done
-                timer_running = False
 
+    #dropdown_algo.draw(screen)
 
-    pygame.display.flip()
+    if full_redraw:
+        pygame.display.flip()
+        full_redraw = False
+    elif dirty_rects:
+        pygame.display.update(dirty_rects)
 
 pygame.quit()
@@ -0,0 +1,120 @@
+import mmap
+import struct
+import sys
+from array import array
+from compactgrid import CompactGrid
+from mazeJSON import iter_maze_json
+
+# Layout: header, walkable bytes (one per cell), zero padding to a multiple
+# of 8, then one little-endian uint16 cost per cell. start/end are cell ids,
+# -1 when unset.
+MAGIC = b"GTVM"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIIii")  # magic, version, reserved, rows, cols, start, end
+
+
+def _cost_offset(size):
+    return (HEADER.size + size + 7) // 8 * 8
+
+
+def _read_header(buffer, filename):
+    if len(buffer) < HEADER.size:
+        raise ValueError(f"{filename} is too short to be a binary maze")
+    magic, version, _, rows, cols, start, end = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a binary maze file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{filename} uses unsupported maze format version {version}")
+    size = rows * cols
+    if len(buffer) < _cost_offset(size) + 2 * size:
+        raise ValueError(f"{filename} is truncated")
+    for name, cell in (("start", start), ("end", end)):
+        if not -1 <= cell < size:
+            raise ValueError(f"{filename}: {name} tile {cell} is outside the {rows}x{cols} grid")
+    return rows, cols, start, end
+
+
+def export_maze_to_binary(grid, filename="maze.bin"):
+    size = grid.size
+    cost = array("H", grid.cost)
+    if sys.byteorder != "little":
+        cost.byteswap()
+    with open(filename, "wb") as binary_file:
+        binary_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, grid.rows, grid.cols, grid.start_id, grid.end_id))
+        binary_file.write(grid.walkable)
+        binary_file.write(bytes(_cost_offset(size) - HEADER.size - size))
+        binary_file.write(cost)
+    print(f"Maze exported to {filename}")
+
+
+def open_maze_binary(filename="maze.bin"):
+    # Returns a CompactGrid whose walkable and cost arrays are copy-on-write
+    # views of the mapped file, so only the pages a search touches are read.
+    # Colors are left at their defaults; call recolor_from_terrain() to draw it.
+    with open(filename, "rb") as binary_file:
+        mapped = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_COPY)
+    rows, cols, start, end = _read_header(mapped, filename)
+    size = rows * cols
+    offset = _cost_offset(size)
+    view = memoryview(mapped)
+    walkable = view[HEADER.size:HEADER.size + size]
+    if sys.byteorder == "little":
+        cost = view[offset:offset + 2 * size].cast("H")
+    else:
+        cost = array("H", view[offset:offset + 2 * size])
+        cost.byteswap()
+    grid = CompactGrid(rows, cols, walkable, cost)
+    grid.start_id = start
+    grid.end_id = end
+    return grid
+
+
+def load_maze_from_binary(grid, filename="maze.bin"):
+    with open(filename, "rb") as binary_file:
+        with mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            rows, cols, start, end = _read_header(mapped, filename)
+            if (rows, cols) != (grid.rows, grid.cols):
+                raise ValueError(f"{filename} holds a {rows}x{cols} maze, the grid is {grid.rows}x{grid.cols}")
+            size = rows * cols
+            offset = _cost_offset(size)
+            grid.walkable[:] = mapped[HEADER.size:HEADER.size + size]
+            memoryview(grid.cost).cast("B")[:] = mapped[offset:offset + 2 * size]
+    if sys.byteorder != "little":
+        grid.cost.byteswap()
+    print(f"Maze loaded from {filename}")
+
+    grid.start_id = start
+    grid.end_id = end
+    grid.invalidate_neighbor_index()
+    grid.recolor_from_terrain()
+    grid.changed = True
+
+
+def convert_json_to_binary(json_filename="maze.json", binary_filename="maze.bin"):
+    # Streams the JSON rows, so the converter never holds more than the arrays
+    walkable = bytearray()
+    cost = array("H")
+    positions = {"start": None, "end": None}
+    cols = None
+    for event in iter_maze_json(json_filename):
+        if event[0] != "row":
+            positions[event[0]] = event[1]
+            continue
+        row_data = event[2]
+        if cols is None:
+            cols = len(row_data)
+        elif len(row_data) != cols:
+            raise ValueError(f"{json_filename}: row {event[1]} has {len(row_data)} tiles, expected {cols}")
+        walkable.extend(1 if tile_data["walkable"] else 0 for tile_data in row_data)
+        cost.extend(tile_data["cost"] for tile_data in row_data)
+
+    cols = cols or 0
+    grid = CompactGrid(len(walkable) // cols if cols else 0, cols, walkable, cost)
+    for key in ("start", "end"):
+        if positions[key]:
+            setattr(grid, key + "_id", positions[key]["row"] * cols + positions[key]["col"])
+    export_maze_to_binary(grid, binary_filename)
+
+if __name__ == "__main__":
+    # python mazeBinary.py [maze.json] [maze.bin]
+    convert_json_to_binary(*sys.argv[1:3])
@@ -1,57 +1,203 @@
+from array import array
 import json
 from settings import *
+from compactgrid import BLOCKED_COLOR, START, END
 
+CHUNK_SIZE = 64 * 1024
+MAX_TILE_COST = 0xFFFF  # Costs are stored as uint16
 
-def export_maze_to_json(grid, filename="maze.json"):
-    maze_data = {
-        "start": {"row": grid.start_tile.row, "col": grid.start_tile.col} if grid.start_tile else None,
-        "end": {"row": grid.end_tile.row, "col": grid.end_tile.col} if grid.end_tile else None,
-        "tiles": []
-    }
-
-    # Add grid tiles' walkability and costs to the JSON structure
-    for row in grid.tiles:
-        row_data = []
-        for tile in row:
-            tile_data = {
-                "walkable": tile.walkable,
-                "cost": tile.cost if hasattr(tile, 'cost') else 1,  # Default cost is 1 if no specific cost
-                "color": tile.color
-            }
-            row_data.append(tile_data)
-        maze_data["tiles"].append(row_data)
-
-    # Save the data to a JSON file
-    with open(filename, 'w') as json_file:
-        json.dump(maze_data, json_file, indent=4)
-    print(f"Maze exported to {filename}")
 
+class _JSONStream:
+    # Pulls JSON values out of a file a chunk at a time so that only the value
+    # being decoded (one tile, one key) has to be in memory
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.file.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of maze file")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in maze file, found {self.buffer[self.pos]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue  # A number may continue in the next chunk
+            self.pos = end
+            return value
+
+    def items(self, close):
+        # Iterates over the elements of an array (or members of an object) whose
+        # opening bracket was just consumed; the caller reads each element
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == close:
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or {close!r} in maze file, found {char!r}")
+
+
+def iter_maze_json(filename="maze.json"):
+    # Yields ("start", position), ("end", position) and ("row", index, tiles)
+    # in file order, holding only one row of tiles at a time
+    with open(filename, "r") as json_file:
+        stream = _JSONStream(json_file)
+        stream.expect("{")
+        for _ in stream.items("}"):
+            key = stream.value()
+            stream.expect(":")
+            if key != "tiles":
+                yield (key, stream.value())
+                continue
+            stream.expect("[")
+            row_idx = 0
+            for _ in stream.items("]"):
+                stream.expect("[")
+                yield ("row", row_idx, [stream.value() for _ in stream.items("]")])
+                row_idx += 1
+
+
+def _position_to_cell(grid, position, filename):
+    if not position:
+        return -1
+    row, col = position["row"], position["col"]
+    if not grid.in_bounds(row, col):
+        raise ValueError(f"{filename}: position ({row}, {col}) is outside the {grid.rows}x{grid.cols} grid")
+    return grid.index(row, col)
 
-def load_maze_from_json(grid, filename="maze.json"):
 
-    with open(filename, 'r') as json_file:
-        maze_data = json.load(json_file)
+def load_maze_from_json(grid, filename="maze.json"):
+    # The grid is left as it was when the file turns out to be malformed
+    _load_maze(grid, filename)
     print(f"Maze loaded from {filename}")
-    # Clear current grid
-    for row in grid.tiles:
-        for tile in row:
-            tile.set_clear()
-
-    # Load start and end positions
-    if maze_data["start"]:
-        start_pos = maze_data["start"]
-        grid.set_start((start_pos["col"] * TILE_SIZE, start_pos["row"] * TILE_SIZE))
-
-    if maze_data["end"]:
-        end_pos = maze_data["end"]
-        grid.set_end((end_pos["col"] * TILE_SIZE, end_pos["row"] * TILE_SIZE))
-
-    # Load tile costs and walkability
-    for row_idx, row_data in enumerate(maze_data["tiles"]):
-        for col_idx, tile_data in enumerate(row_data):
-            tile = grid.tiles[row_idx][col_idx]
-            tile.walkable = tile_data["walkable"]
-            tile.color = tile_data["color"]
-            if tile_data["cost"] > 1:
-                tile.set_costly(tile_data["cost"])  # Set costly tiles
 
+
+def _load_maze(grid, filename):
+    # Tiles are read into new arrays and copied into the grid once the whole
+    # file has been checked
+    size = grid.size
+    walkable, cost, color = bytearray(size), array("H", bytes(2 * size)), bytearray(size)
+    fill, blocked, costly = grid.color_index(GRID_FILL), grid.color_index(BLOCKED_COLOR), grid.color_index(ORANGE)
+    positions = {"start": None, "end": None}
+    rows = 0
+    has_color = True
+
+    for event in iter_maze_json(filename):
+        if event[0] != "row":
+            positions[event[0]] = event[1]
+            continue
+        _, row_idx, row_data = event
+        if row_idx >= grid.rows or len(row_data) != grid.cols:
+            raise ValueError(f"{filename}: maze does not match the {grid.rows}x{grid.cols} grid")
+        cell = row_idx * grid.cols
+        for tile_data in row_data:
+            tile_cost = tile_data["cost"]
+            if type(tile_cost) is not int or not 0 <= tile_cost <= MAX_TILE_COST:
+                raise ValueError(f"{filename}: tile {divmod(cell, grid.cols)} has cost {tile_cost!r}, "
+                                 f"expected a whole number from 0 to {MAX_TILE_COST}")
+            walkable[cell] = 1 if tile_data["walkable"] else 0
+            cost[cell] = tile_cost
+            if "color" in tile_data:
+                color[cell] = grid.color_index(tile_data["color"])
+            else:
+                # Compact files carry no colors
+                color[cell] = fill if walkable[cell] else blocked
+                has_color = False
+            if tile_cost > 1:
+                color[cell] = costly  # Set costly tiles
+            cell += 1
+        rows += 1
+    if rows != grid.rows:
+        raise ValueError(f"{filename}: maze has {rows} rows, the grid has {grid.rows}")
+    start_id = _position_to_cell(grid, positions["start"], filename)
+    end_id = _position_to_cell(grid, positions["end"], filename)
+
+    grid.walkable[:] = walkable
+    grid.cost[:] = cost
+    grid.color[:] = color
+    grid.flags[:] = bytes(size)
+    grid.start_id, grid.end_id = start_id, end_id
+    for cell, flag, default_color in ((start_id, START, START_TILE), (end_id, END, GOAL_TILE)):
+        if cell >= 0:
+            grid.flags[cell] |= flag
+            if not has_color:
+                grid.color[cell] = grid.color_index(default_color)
+    grid.invalidate_neighbor_index()
+    grid.changed = True
+
+
+def _write_rows(json_file, grid, render_tile, open_row, close_row, separator):
+    rendered = {}  # Identical tiles are rendered once
+    walkable, cost, color = grid.walkable, grid.cost, grid.color
+    for row in range(grid.rows):
+        if row:
+            json_file.write(separator)
+        parts = []
+        for cell in range(row * grid.cols, (row + 1) * grid.cols):
+            key = (walkable[cell], cost[cell], color[cell])
+            text = rendered.get(key)
+            if text is None:
+                text = rendered[key] = render_tile(walkable[cell] == 1, cost[cell], grid.palette[color[cell]])
+            parts.append(text)
+        json_file.write(open_row + separator.join(parts) + close_row)
+
+
+def export_maze_to_json(grid, filename="maze.json", compact=False):
+    start = {"row": grid.start_id // grid.cols, "col": grid.start_id % grid.cols} if grid.start_id >= 0 else None
+    end = {"row": grid.end_id // grid.cols, "col": grid.end_id % grid.cols} if grid.end_id >= 0 else None
+
+    # Written row by row; the pretty layout matches json.dump(..., indent=4)
+    with open(filename, 'w') as json_file:
+        if compact:
+            separators = (",", ":")
+            json_file.write('{"start":' + json.dumps(start, separators=separators)
+                            + ',"end":' + json.dumps(end, separators=separators) + ',"tiles":[')
+            _write_rows(json_file, grid,
+                        lambda walkable, cost, color: json.dumps({"walkable": walkable, "cost": cost}, separators=separators),
+                        "[", "]", ",")
+            json_file.write("]}")
+        else:
+            def render_tile(walkable, cost, color):
+                tile_data = {"walkable": walkable, "cost": cost, "color": list(color)}
+                return " " * 12 + json.dumps(tile_data, indent=4).replace("\n", "\n" + " " * 12)
+
+            json_file.write('{\n    "start": ' + json.dumps(start, indent=4).replace("\n", "\n    ")
+                            + ',\n    "end": ' + json.dumps(end, indent=4).replace("\n", "\n    ")
+                            + ',\n    "tiles": [\n')
+            _write_rows(json_file, grid, render_tile, " " * 8 + "[\n", "\n" + " " * 8 + "]", ",\n")
+            json_file.write("\n    ]\n}")
+    print(f"Maze exported to {filename}")
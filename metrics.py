@@ -0,0 +1,106 @@
+import json
+
+# Hook events a SearchStats can be subscribed to
+EXPAND = "expand"  # callback(cell) for every expanded cell
+FINISH = "finish"  # callback(record) once the run is over
+
+
+class SearchStats:
+    # Counters filled in by a search given stats=...; every search takes
+    # stats=None and then only pays for the `is not None` checks.
+    #   expanded   cells expanded
+    #   pushes     entries added to the open set (queue, stack, heap, lists)
+    #   pops       entries taken out of it, including stale ones
+    #   stale      popped entries skipped as already closed or outdated
+    #   revisits   neighbours looked at again without being pushed
+    #   peak_open  largest open set seen at an expansion
+
+    def __init__(self, algorithm=""):
+        self.algorithm = algorithm
+        self.expanded = 0
+        self.pushes = 0
+        self.pops = 0
+        self.stale = 0
+        self.revisits = 0
+        self.peak_open = 0
+        self.neighbor_time = 0.0  # Seconds spent fetching (or building) the neighbor index
+        self.setup_time = 0.0  # Seconds spent on per-run structures: heuristic, JPS jump tables, HPA* cluster graph
+        self.elapsed = None
+        self.found = None
+        self.cost = None
+        self.path_length = None
+        self.hooks = {}
+
+    def subscribe(self, event, callback):
+        self.hooks.setdefault(event, []).append(callback)
+
+    def expand(self, cell, open_size):
+        self.expanded += 1
+        if open_size > self.peak_open:
+            self.peak_open = open_size
+        for callback in self.hooks.get(EXPAND, ()):
+            callback(cell)
+
+    def finish(self, grid, path, elapsed):
+        self.elapsed = elapsed
+        self.found = path is not None
+        if path is not None:
+            self.path_length = len(path)
+            self.cost = grid.path_cost(path)
+        record = self.record()
+        for callback in self.hooks.get(FINISH, ()):
+            callback(record)
+        return record
+
+    def absorb(self, other):
+        # Take over the counters of a run measured elsewhere (e.g. a worker process)
+        for name in ("expanded", "pushes", "pops", "stale", "revisits", "peak_open", "neighbor_time", "setup_time"):
+            setattr(self, name, getattr(other, name))
+
+    def record(self):
+        return {
+            "algorithm": self.algorithm,
+            "found": self.found,
+            "cost": self.cost,
+            "path_length": self.path_length,
+            "expanded": self.expanded,
+            "pushes": self.pushes,
+            "pops": self.pops,
+            "stale": self.stale,
+            "revisits": self.revisits,
+            "peak_open": self.peak_open,
+            "neighbor_time": self.neighbor_time,
+            "setup_time": self.setup_time,
+            "elapsed": self.elapsed,
+        }
+
+    def summary(self):
+        # One line for the stats panel; pops are expanded + stale (+1 for the goal)
+        text = (f"{self.algorithm}: expanded {_short(self.expanded)}, push {_short(self.pushes)}, "
+                f"stale {_short(self.stale)}, revisit {_short(self.revisits)}, peak {_short(self.peak_open)}")
+        if self.cost is not None:
+            text += f", cost {round(self.cost, 2)}"  # Diagonal steps make costs fractional
+        return text
+
+    def __getstate__(self):
+        # Hooks stay with the process that subscribed them
+        state = dict(self.__dict__)
+        state["hooks"] = {}
+        return state
+
+
+def _short(count):
+    # 1234 -> "1234", 123456 -> "123k", 12345678 -> "12.3M"
+    if count < 10000:
+        return str(count)
+    if count < 1000000:
+        return f"{count // 1000}k"
+    return f"{count / 1000000:.1f}M"
+
+
+def export_records(records, filename="metrics.jsonl"):
+    # One JSON object per line, appended so several sessions can share a file
+    with open(filename, "a") as records_file:
+        for record in records:
+            records_file.write(json.dumps(record) + "\n")
+    print(f"{len(records)} run records exported to {filename}")
@@ -0,0 +1,53 @@
+import math
+
+# Movement models a grid can be searched with, by name. Every model steps
+# straight up, down, left and right; the 8-connected ones also step
+# diagonally, each with its own rule for passing the corner between the two
+# tiles beside a diagonal step.
+
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # Up, Down, Left, Right
+DIAGONALS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+DIAGONAL_COST = math.sqrt(2)  # A diagonal step costs this times the weight of the tile entered
+
+# Open tiles needed beside a diagonal step
+NO_CORNERS = 2  # Both: never cut a wall's corner
+CUT_CORNERS = 1  # One: may cut the corner of a single wall
+SQUEEZE = 0  # None: may squeeze between two walls
+
+
+class Movement:
+
+    def __init__(self, name, description, diagonal=False, corners=NO_CORNERS, heuristic="manhattan"):
+        self.name = name
+        self.description = description
+        self.diagonal = diagonal
+        self.corners = corners
+        self.heuristic = heuristic  # Admissible default for searches not told which heuristic to use
+        self.directions = DIRECTIONS + DIAGONALS if diagonal else DIRECTIONS
+
+    def neighbors(self, walkable, rows, cols, cell):
+        # Cells one step from cell that a path may enter, straight steps first.
+        # Does not look at cell itself, so a wall's list is what it would join.
+        row, col = divmod(cell, cols)
+        found = []
+        for drow, dcol in self.directions:
+            next_row, next_col = row + drow, col + dcol
+            if not (0 <= next_row < rows and 0 <= next_col < cols):
+                continue
+            neighbor = next_row * cols + next_col
+            if not walkable[neighbor]:
+                continue
+            if drow and dcol and (bool(walkable[row * cols + next_col])
+                                  + bool(walkable[next_row * cols + col])) < self.corners:
+                continue
+            found.append(neighbor)
+        return found
+
+
+MOVEMENTS = {
+    "4": Movement("4", "4-connected"),
+    "8": Movement("8", "8-connected, no corner cutting", True, NO_CORNERS, "octile"),
+    "8 cut": Movement("8 cut", "8-connected, cutting single corners", True, CUT_CORNERS, "octile"),
+    "8 squeeze": Movement("8 squeeze", "8-connected, squeezing between walls", True, SQUEEZE, "octile"),
+}
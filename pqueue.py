@@ -0,0 +1,111 @@
+import heapq
+import itertools
+from settings import *
+
+# Priority queues of cell ids for the searches: push(priority, cell) with an
+# integer priority, pop() returns the cell with the lowest one, or -1 once
+# the queue is empty. monotone_queue and bounded_queue pick a bucket queue
+# when it is exact for the priorities the search will push, else a heap.
+
+
+class HeapQueue:
+    # Any priorities, O(log n) per operation; ties pop in push order
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def push(self, priority, cell):
+        heapq.heappush(self.heap, (priority, next(self.counter), cell))
+
+    def pop(self):
+        if not self.heap:
+            return -1
+        return heapq.heappop(self.heap)[2]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class BucketQueue:
+    # One list per priority in [0, limit). Pushing below the lowest bucket in
+    # use moves the cursor back, so priorities may go up and down. Ties pop
+    # last in, first out.
+
+    def __init__(self, limit):
+        self.buckets = [[] for _ in range(limit)]
+        self.cursor = limit
+        self.count = 0
+
+    def push(self, priority, cell):
+        self.buckets[priority].append(cell)
+        self.count += 1
+        if priority < self.cursor:
+            self.cursor = priority
+
+    def pop(self):
+        if not self.count:
+            return -1
+        buckets = self.buckets
+        cursor = self.cursor
+        while not buckets[cursor]:
+            cursor += 1
+        self.cursor = cursor
+        self.count -= 1
+        return buckets[cursor].pop()
+
+    def __len__(self):
+        return self.count
+
+
+class DialQueue:
+    # Dial's algorithm: width buckets used as a ring. Exact as long as no
+    # priority is pushed below the last one popped (or the first one pushed,
+    # before any pop) or width or more above it, which holds for A* with a
+    # consistent heuristic and step costs of at most width - 2. Ties pop last
+    # in, first out.
+
+    def __init__(self, width):
+        self.buckets = [[] for _ in range(width)]
+        self.width = width
+        self.cursor = -1  # Bucket of the last priority popped, set by the first push
+        self.count = 0
+
+    def push(self, priority, cell):
+        if self.cursor < 0:
+            self.cursor = priority % self.width
+        self.buckets[priority % self.width].append(cell)
+        self.count += 1
+
+    def pop(self):
+        if not self.count:
+            return -1
+        buckets = self.buckets
+        cursor = self.cursor
+        bucket = buckets[cursor]
+        while not bucket:
+            cursor += 1
+            if cursor == self.width:
+                cursor = 0
+            bucket = buckets[cursor]
+        self.cursor = cursor
+        self.count -= 1
+        return bucket.pop()
+
+    def __len__(self):
+        return self.count
+
+
+def monotone_queue(width):
+    # For priorities that never drop below the last one popped and stay less
+    # than width above it; width None means there is no such bound
+    if PRIORITY_QUEUE == "heap" or width is None or width > BUCKET_QUEUE_MAX_WIDTH:
+        return HeapQueue()
+    return DialQueue(width)
+
+
+def bounded_queue(limit):
+    # For priorities in [0, limit) that may go down as well as up
+    if PRIORITY_QUEUE == "heap":
+        return HeapQueue()
+    return BucketQueue(limit)
@@ -0,0 +1,116 @@
+import math
+import time
+import pygame
+from settings import *
+from algorithms import explored_marker
+from search import SEARCHES, path_cost
+from visualizer import Visualizer
+
+# How the views of a race are advanced
+LOCKSTEP = "lockstep"  # Every view takes one step per round
+WALL_CLOCK = "wall clock"  # Every view gets the same time per round
+
+LABEL_HEIGHT = 18
+ROUND_TIME = 0.001  # Seconds each view runs per wall-clock round
+
+
+class RaceView:
+    # One algorithm of a race on its own view of the maze
+
+    def __init__(self, grid, algorithm, viewport):
+        self.algorithm = algorithm
+        self.viewport = viewport
+        self.area = pygame.Rect(viewport.x, viewport.y + LABEL_HEIGHT, viewport.width, viewport.height - LABEL_HEIGHT)
+        tile_size = max(1, min(self.area.width // grid.cols, self.area.height // grid.rows))
+        self.grid = grid.shared_view(tile_size)
+        self.grid.clear_path()
+        self.visualizer = Visualizer(self.grid)
+        self.steps = 0
+        self.elapsed = 0.0  # Time spent inside this view's search
+        self.path = None
+        self.expanded = None
+        self.done = False
+        self.generator = SEARCHES[algorithm](self.grid, grid.start_id, grid.end_id, explored_marker(self.grid))
+        self.font = pygame.font.SysFont(None, 20)
+        self.drawn_label = None
+
+    def step(self):
+        start_time = time.perf_counter()
+        try:
+            next(self.generator)
+            self.steps += 1
+        except StopIteration as stop:
+            self.path, self.expanded = stop.value
+            self.done = True
+        self.elapsed += time.perf_counter() - start_time
+        if self.done and self.path is not None:
+            path_color = self.grid.color_index(PATH_COLOR)
+            for cell in self.path[1:-1]:
+                self.grid.paint(cell, path_color)
+
+    def label(self):
+        if not self.done:
+            return f"{self.algorithm}: {self.steps} steps"
+        if self.path is None:
+            return f"{self.algorithm}: no path, {self.expanded} expanded, {self.elapsed * 1000:.1f} ms"
+        return (f"{self.algorithm}: cost {round(path_cost(self.grid, self.path), 2)}, "
+                f"{self.expanded} expanded, {self.elapsed * 1000:.1f} ms")
+
+    def draw(self, surface):
+        # Returns the screen rects that changed
+        rects = [rect.move(self.area.topleft) for rect in self.visualizer.draw(surface.subsurface(self.area))]
+        label = self.label()
+        if label != self.drawn_label:
+            label_rect = pygame.Rect(self.viewport.x, self.viewport.y, self.viewport.width, LABEL_HEIGHT)
+            surface.fill(CHARCOAL, label_rect)
+            text = self.font.render(label, True, LIGHT_GRAY)
+            surface.blit(text, text.get_rect(midleft=(label_rect.x + 4, label_rect.centery)))
+            self.drawn_label = label
+            rects.append(label_rect)
+        return rects
+
+
+class Race:
+    # Runs several algorithms on views of the same maze, tiled over area
+
+    def __init__(self, grid, algorithms, area, mode=LOCKSTEP):
+        self.mode = mode
+        columns = math.ceil(math.sqrt(len(algorithms)))
+        rows = math.ceil(len(algorithms) / columns)
+        width, height = area.width // columns, area.height // rows
+        self.views = []
+        for index, algorithm in enumerate(algorithms):
+            row, col = divmod(index, columns)
+            viewport = pygame.Rect(area.x + col * width, area.y + row * height, width - 2, height - 2)
+            self.views.append(RaceView(grid, algorithm, viewport))
+
+    @property
+    def done(self):
+        return all(view.done for view in self.views)
+
+    def rounds(self):
+        # Generator for the Stepper; one round per step
+        while not self.done:
+            for view in self.views:
+                if view.done:
+                    continue
+                if self.mode == LOCKSTEP:
+                    view.step()
+                else:
+                    deadline = time.perf_counter() + ROUND_TIME
+                    while not view.done and time.perf_counter() < deadline:
+                        view.step()
+            yield
+        for view in sorted(self.views, key=lambda view: view.elapsed):
+            print(view.label())
+
+    def redraw(self):
+        for view in self.views:
+            view.grid.redraw_all = True
+            view.drawn_label = None
+
+    def draw(self, surface):
+        rects = []
+        for view in self.views:
+            rects.extend(view.draw(surface))
+        return rects
@@ -0,0 +1,863 @@
+from array import array
+from collections import deque
+from contextlib import contextmanager
+import math
+import time
+import weakref
+from pqueue import HeapQueue, bounded_queue, monotone_queue
+from components import connected
+from hpastar import cluster_graph
+from landmarks import landmarks
+from movement import DIAGONAL_COST
+from settings import *
+
+# Every search takes (grid, start, goal, mark=None) with integer cell ids and
+# returns (path, expanded) where path is a list of cell ids or None.
+# When mark is given it is called as mark(kind, cell) for every visited cell
+# and the search yields after each step so the UI can animate it; without it
+# the search never yields and runs straight through. When stats (a
+# metrics.SearchStats) is given the search also counts its queue operations
+# into it; with stats=None that costs one `is not None` test per operation.
+# A goal outside the start's connected region (components.py) is answered
+# with (None, 0) before searching. The searches in HEURISTIC_SEARCHES also
+# take heuristic=..., a name from HEURISTICS, and A* and FRINGE weight=...;
+# left out, they come from ALGORITHM_HEURISTICS and HEURISTIC_WEIGHTS.
+VISIT = 0
+VISIT_BACK = 1  # Cells reached from the goal side of a bidirectional search
+
+
+def heuristic(grid, a, b):
+    # Manhattan distance between two cell ids
+    a_row, a_col = divmod(a, grid.cols)
+    b_row, b_col = divmod(b, grid.cols)
+    return abs(a_row - b_row) + abs(a_col - b_col)
+
+
+def octile_heuristic(grid, start, goal):
+    cols = grid.cols
+    goal_row, goal_col = divmod(goal, cols)
+    extra = DIAGONAL_COST - 1
+
+    def h(cell):
+        row, col = divmod(cell, cols)
+        drow, dcol = abs(row - goal_row), abs(col - goal_col)
+        return drow + extra * dcol if drow > dcol else dcol + extra * drow
+    return h
+
+
+def chebyshev_heuristic(grid, start, goal):
+    cols = grid.cols
+    goal_row, goal_col = divmod(goal, cols)
+
+    def h(cell):
+        row, col = divmod(cell, cols)
+        return max(abs(row - goal_row), abs(col - goal_col))
+    return h
+
+
+def euclidean_heuristic(grid, start, goal):
+    cols = grid.cols
+    goal_row, goal_col = divmod(goal, cols)
+
+    def h(cell):
+        row, col = divmod(cell, cols)
+        return math.hypot(row - goal_row, col - goal_col)
+    return h
+
+
+def landmark_heuristic(grid, start, goal):
+    # Landmark distances only know straight steps; with diagonals this falls
+    # back to the movement's own heuristic
+    if not grid.movement.diagonal:
+        table = landmarks(grid)
+        if table.cells:
+            return table.heuristic(start, goal)
+    return HEURISTICS[grid.movement.heuristic](grid, start, goal)
+
+
+# Heuristics by name. Each takes (grid, start, goal) and returns h(cell), a
+# lower bound on the cost from cell to goal under the movement noted, given
+# tile costs of at least 1.
+HEURISTICS = {
+    "manhattan": lambda grid, start, goal: lambda cell: heuristic(grid, cell, goal),  # 4-connected only
+    "octile": octile_heuristic,
+    "chebyshev": chebyshev_heuristic,
+    "euclidean": euclidean_heuristic,
+    "zero": lambda grid, start, goal: lambda cell: 0,  # A* then searches like Dijkstra
+    "landmarks": landmark_heuristic,  # See landmarks.py
+}
+INTEGRAL_HEURISTICS = {"manhattan", "chebyshev", "zero", "landmarks"}  # Only ever return integers
+HEURISTIC_SEARCHES = ["A*", "FRINGE", "GREEDY"]
+
+
+def heuristic_name(grid, algorithm, name=None):
+    # The heuristic asked for, else the one set for the algorithm, else the
+    # default of the grid's movement
+    name = name or ALGORITHM_HEURISTICS.get(algorithm) or grid.movement.heuristic
+    if name not in HEURISTICS:
+        raise ValueError(f"Unknown heuristic {name!r}, expected one of {sorted(HEURISTICS)}")
+    return name
+
+
+def goal_heuristic(grid, name, start, goal, weight=1, stats=None):
+    # h(cell) for one run, times weight. Setting it up (landmark distances
+    # are recomputed after edits) is timed into stats as setup.
+    begin = time.perf_counter()
+    h = HEURISTICS[name](grid, start, goal)
+    if stats is not None:
+        stats.setup_time += time.perf_counter() - begin
+    if weight != 1:
+        unweighted = h
+        h = lambda cell: weight * unweighted(cell)
+    return h
+
+
+class SearchState:
+    # Per-cell search arrays sized to a grid and reused from run to run:
+    # parent cell, g score and a stamp telling which of them belong to the
+    # current run. Each run takes a new generation; a cell is seen in this run
+    # when stamp >= seen and closed when stamp == closed, so starting a run
+    # never clears anything. 16 bytes per cell, no hashing.
+
+    def __init__(self, size):
+        self.size = size
+        self.parent = array("i", bytes(4 * size))
+        self.g = array("q", bytes(8 * size))
+        self.stamp = array("I", bytes(4 * size))
+        self.generation = 0
+        self.real_g = None
+
+    def fractional_g(self):
+        # g scores for grids with diagonal steps, whose costs are not whole
+        # numbers; made on first use
+        if self.real_g is None:
+            self.real_g = array("d", bytes(8 * self.size))
+        return self.real_g
+
+    def begin(self):
+        # Starts a run and returns its (seen, closed) stamps
+        self.generation += 1
+        if 2 * self.generation + 1 > 0xFFFFFFFF:
+            self.stamp[:] = array("I", bytes(4 * self.size))
+            self.generation = 1
+        return 2 * self.generation, 2 * self.generation + 1
+
+
+IDLE_STATES = 2  # SearchStates kept per grid between runs (race mode runs two searches at once)
+
+_idle_states = weakref.WeakKeyDictionary()
+
+
+@contextmanager
+def search_state(grid):
+    # Lends a SearchState for one run. A search suspended by the UI keeps its
+    # state until it finishes or is closed; others running meanwhile get their own.
+    idle = _idle_states.setdefault(grid, [])
+    state = idle.pop() if idle else None
+    if state is None or state.size != grid.size:
+        state = SearchState(grid.size)
+    try:
+        yield state
+    finally:
+        if len(idle) < IDLE_STATES:
+            idle.append(state)
+
+
+def build_path(parent, end):
+    path = [end]
+    current = parent[end]
+    while current >= 0:  # Stop at start tile
+        path.append(current)
+        current = parent[current]
+    path.reverse()
+    return path
+
+
+def path_cost(grid, path):
+    return grid.path_cost(path)
+
+
+def run_search(search, grid, start, goal, stats=None, **options):
+    generator = search(grid, start, goal, None, stats, **options)
+    try:
+        while True:
+            next(generator)
+    except StopIteration as stop:
+        return stop.value
+
+
+def neighbor_index(grid, stats):
+    # grid.neighbor_index(), timed into stats when measuring
+    if stats is None:
+        return grid.neighbor_index()
+    begin = time.perf_counter()
+    index = grid.neighbor_index()
+    stats.neighbor_time += time.perf_counter() - begin
+    return index
+
+
+def bfs_search(grid, start, goal, mark=None, stats=None):
+    if not connected(grid, start, goal):
+        return None, 0
+    offsets, adj, degree = neighbor_index(grid, stats)
+    with search_state(grid) as state:
+        parent, stamp = state.parent, state.stamp
+        seen, _ = state.begin()
+        queue = deque([start])
+        stamp[start] = seen
+        parent[start] = -1
+        expanded = 0
+        if stats is not None:
+            stats.pushes += 1
+
+        while queue:
+            current = queue.popleft()
+            if stats is not None:
+                stats.pops += 1
+            if current == goal:
+                return build_path(parent, goal), expanded
+            expanded += 1
+            if stats is not None:
+                stats.expand(current, len(queue))
+
+            base = offsets[current]
+            for k in range(base, base + degree[current]):
+                neighbor = adj[k]
+                if stamp[neighbor] != seen:
+                    stamp[neighbor] = seen
+                    parent[neighbor] = current
+                    queue.append(neighbor)
+                    if stats is not None:
+                        stats.pushes += 1
+                    if mark is not None:
+                        mark(VISIT, neighbor)
+                        yield
+                elif stats is not None:
+                    stats.revisits += 1
+        return None, expanded
+
+
+def dfs_search(grid, start, goal, mark=None, stats=None):
+    if not connected(grid, start, goal):
+        return None, 0
+    offsets, adj, degree = neighbor_index(grid, stats)
+    with search_state(grid) as state:
+        parent, stamp = state.parent, state.stamp
+        _, closed = state.begin()
+        stack = [start]
+        parent[start] = -1
+        expanded = 0
+        if stats is not None:
+            stats.pushes += 1
+
+        while stack:
+            current = stack.pop()
+            if stats is not None:
+                stats.pops += 1
+            if stamp[current] == closed:
+                if stats is not None:
+                    stats.stale += 1
+                continue
+            stamp[current] = closed
+            if current == goal:
+                return build_path(parent, goal), expanded
+            expanded += 1
+            if stats is not None:
+                stats.expand(current, len(stack))
+            if mark is not None:
+                mark(VISIT, current)
+                yield
+
+            base = offsets[current]
+            for k in range(base, base + degree[current]):
+                neighbor = adj[k]
+                if stamp[neighbor] != closed:
+                    stack.append(neighbor)
+                    parent[neighbor] = current
+                    if stats is not None:
+                        stats.pushes += 1
+                elif stats is not None:
+                    stats.revisits += 1
+        return None, expanded
+
+
+def astar_search(grid, start, goal, mark=None, stats=None, heuristic=None, weight=None):
+    # With weight > 1 this is weighted A*: fewer expansions, paths at most
+    # weight times the cost of the shortest
+    if not connected(grid, start, goal):
+        return None, 0
+    offsets, adj, degree = neighbor_index(grid, stats)
+    with search_state(grid) as state:
+        cost = grid.cost
+        diagonal, diagonal_step = grid.movement.diagonal, grid.diagonal_step
+        name = heuristic_name(grid, "A*", heuristic)
+        if weight is None:
+            weight = HEURISTIC_WEIGHTS.get("A*", 1)
+        h = goal_heuristic(grid, name, start, goal, weight, stats)
+        # The integral heuristics are consistent when every step costs at
+        # least 1, so f never drops; a step raises g by one tile cost and
+        # lowers h by at most another (by 1 for Manhattan distance). Anything
+        # else, fractional or inflated, gets a heap.
+        low, high = grid.cost_range()
+        exact = low >= 1 and weight == 1 and not diagonal and name in INTEGRAL_HEURISTICS
+        open_set = monotone_queue(2 * high + 2 if exact else None)
+        push, pop = open_set.push, open_set.pop
+
+        parent, stamp = state.parent, state.stamp
+        g = state.fractional_g() if diagonal else state.g
+        seen, closed = state.begin()
+        push(h(start), start)
+        stamp[start] = seen
+        parent[start] = -1
+        g[start] = 0
+        expanded = 0
+        if stats is not None:
+            stats.pushes += 1
+
+        while True:
+            current = pop()
+            if current < 0:
+                break
+            if stats is not None:
+                stats.pops += 1
+            if stamp[current] == closed:
+                if stats is not None:
+                    stats.stale += 1
+                continue
+            stamp[current] = closed
+            if current == goal:
+                return build_path(parent, goal), expanded
+            expanded += 1
+            if stats is not None:
+                stats.expand(current, len(open_set))
+
+            current_g = g[current]
+            base = offsets[current]
+            for k in range(base, base + degree[current]):
+                neighbor = adj[k]
+                tentative_g = current_g + cost[neighbor]
+                if diagonal and diagonal_step[k]:
+                    tentative_g += (DIAGONAL_COST - 1) * cost[neighbor]
+                if stamp[neighbor] < seen:
+                    stamp[neighbor] = seen
+                elif tentative_g >= g[neighbor]:
+                    if stats is not None:
+                        stats.revisits += 1
+                    continue
+                parent[neighbor] = current
+                g[neighbor] = tentative_g
+                push(tentative_g + h(neighbor), neighbor)
+                if stats is not None:
+                    stats.pushes += 1
+                if mark is not None:
+                    mark(VISIT, neighbor)
+            if mark is not None:
+                yield
+        return None, expanded
+
+
+def jump_tables(grid):
+    # For every cell and direction, where a straight jump from it stops, encoded
+    # as stop * 2 + 1 for a jump point (row/col of the stop) or wall * 2 for the
+    # first blocked row/col. Vertical jumps stop where a horizontal turn is
+    # forced, horizontal jumps stop where either vertical jump finds a point.
+    # Rebuilt only when the grid version changes.
+    cached = _jump_table_cache.get(grid)
+    if cached is not None and cached[0] == grid.version:
+        return cached[1]
+
+    rows, cols = grid.rows, grid.cols
+    walkable = grid.walkable
+    empty = bytes(4 * grid.size)
+    up, down, left, right = array("i", empty), array("i", empty), array("i", empty), array("i", empty)
+
+    def free(row, col):
+        return 0 <= row < rows and 0 <= col < cols and walkable[row * cols + col]
+
+    def forced(row, col, drow):
+        # Arriving at (row, col) moving by drow, can we be forced to turn sideways?
+        return ((free(row, col - 1) and not free(row - drow, col - 1))
+                or (free(row, col + 1) and not free(row - drow, col + 1)))
+
+    for col in range(cols):
+        following = 2 * rows
+        for row in range(rows - 1, -1, -1):
+            cell = row * cols + col
+            down[cell] = following
+            if not walkable[cell]:
+                following = 2 * row
+            elif forced(row, col, 1):
+                following = 2 * row + 1
+        following = -2
+        for row in range(rows):
+            cell = row * cols + col
+            up[cell] = following
+            if not walkable[cell]:
+                following = 2 * row
+            elif forced(row, col, -1):
+                following = 2 * row + 1
+
+    for row in range(rows):
+        base = row * cols
+        following = 2 * cols
+        for col in range(cols - 1, -1, -1):
+            cell = base + col
+            right[cell] = following
+            if not walkable[cell]:
+                following = 2 * col
+            elif up[cell] & 1 or down[cell] & 1:
+                following = 2 * col + 1
+        following = -2
+        for col in range(cols):
+            cell = base + col
+            left[cell] = following
+            if not walkable[cell]:
+                following = 2 * col
+            elif up[cell] & 1 or down[cell] & 1:
+                following = 2 * col + 1
+
+    tables = (up, down, left, right)
+    _jump_table_cache[grid] = (grid.version, tables)
+    return tables
+
+
+_jump_table_cache = weakref.WeakKeyDictionary()
+
+
+def jps_search(grid, start, goal, mark=None, stats=None):
+    # Jump Point Search on the 4-connected grid. Paths are canonical when they
+    # turn from vertical to horizontal only next to an obstacle, so only jump
+    # points (corners, the goal, and cells from which those can be reached
+    # vertically) are pushed. Only valid for unit costs and straight steps;
+    # weighted grids and grids with diagonal moves use A*.
+    if not connected(grid, start, goal):
+        return None, 0
+    if grid.movement.diagonal or not grid.uniform_cost():
+        return (yield from astar_search(grid, start, goal, mark, stats))
+
+    cols = grid.cols
+    walkable = grid.walkable
+    if stats is None:
+        up, down, left, right = jump_tables(grid)
+    else:
+        begin = time.perf_counter()
+        up, down, left, right = jump_tables(grid)
+        stats.setup_time += time.perf_counter() - begin
+    goal_row, goal_col = divmod(goal, cols)
+
+    def jump_vertical(row, col, drow):
+        if drow > 0:
+            code = down[row * cols + col]
+            stop, is_jump = code >> 1, code & 1
+            reaches_goal = row < goal_row < stop + is_jump
+        else:
+            code = up[row * cols + col]
+            stop, is_jump = code >> 1, code & 1
+            reaches_goal = stop - is_jump < goal_row < row
+        if col == goal_col and reaches_goal:
+            return goal
+        return stop * cols + col if is_jump else -1
+
+    def jump_horizontal(row, col, dcol):
+        if dcol > 0:
+            code = right[row * cols + col]
+            stop, is_jump = code >> 1, code & 1
+            passes_goal_col = col < goal_col < stop + is_jump
+        else:
+            code = left[row * cols + col]
+            stop, is_jump = code >> 1, code & 1
+            passes_goal_col = stop - is_jump < goal_col < col
+        if passes_goal_col and (row == goal_row or jump_vertical(row, goal_col, 1 if goal_row > row else -1) == goal):
+            return row * cols + goal_col
+        return row * cols + stop if is_jump else -1
+
+    def forced_turns(row, col, drow):
+        # Horizontal directions that must be tried after arriving at (row, col) moving by drow
+        turns = []
+        for dcol in (-1, 1):
+            if 0 <= col + dcol < cols and walkable[row * cols + col + dcol] and not walkable[(row - drow) * cols + col + dcol]:
+                turns.append(dcol)
+        return turns
+
+    with search_state(grid) as state:
+        came_from, g, stamp = state.parent, state.g, state.stamp
+        seen, closed = state.begin()
+        # A jump of d cells raises f by 0..2d
+        open_set = monotone_queue(2 * max(grid.rows, cols))
+        push, pop = open_set.push, open_set.pop
+        push(abs(start // cols - goal_row) + abs(start % cols - goal_col), start)
+        stamp[start] = seen
+        came_from[start] = -1
+        g[start] = 0
+        expanded = 0
+        if stats is not None:
+            stats.pushes += 1
+
+        while True:
+            current = pop()
+            if current < 0:
+                break
+            if stats is not None:
+                stats.pops += 1
+            if stamp[current] == closed:
+                if stats is not None:
+                    stats.stale += 1
+                continue
+            stamp[current] = closed
+            if current == goal:
+                return _fill_jumps(grid, build_path(came_from, goal)), expanded
+            expanded += 1
+            if stats is not None:
+                stats.expand(current, len(open_set))
+
+            row, col = divmod(current, cols)
+            parent = came_from[current]
+            if parent < 0:
+                successors = [jump_vertical(row, col, -1), jump_vertical(row, col, 1),
+                              jump_horizontal(row, col, -1), jump_horizontal(row, col, 1)]
+            else:
+                parent_row, parent_col = divmod(parent, cols)
+                if parent_row == row:
+                    # Moving horizontally: keep going or turn either way
+                    dcol = 1 if col > parent_col else -1
+                    successors = [jump_horizontal(row, col, dcol),
+                                  jump_vertical(row, col, -1), jump_vertical(row, col, 1)]
+                else:
+                    drow = 1 if row > parent_row else -1
+                    successors = [jump_vertical(row, col, drow)]
+                    successors += [jump_horizontal(row, col, dcol) for dcol in forced_turns(row, col, drow)]
+
+            current_g = g[current]
+            for neighbor in successors:
+                if neighbor < 0:
+                    continue
+                neighbor_row, neighbor_col = divmod(neighbor, cols)
+                tentative_g = current_g + abs(neighbor_row - row) + abs(neighbor_col - col)
+                if stamp[neighbor] < seen:
+                    stamp[neighbor] = seen
+                elif tentative_g >= g[neighbor]:
+                    if stats is not None:
+                        stats.revisits += 1
+                    continue
+                came_from[neighbor] = current
+                g[neighbor] = tentative_g
+                push(tentative_g + abs(neighbor_row - goal_row) + abs(neighbor_col - goal_col), neighbor)
+                if stats is not None:
+                    stats.pushes += 1
+                if mark is not None:
+                    mark(VISIT, neighbor)
+            if mark is not None:
+                yield
+        return None, expanded
+
+
+def _fill_jumps(grid, jump_points):
+    # Expand the straight segments between consecutive jump points into cells
+    path = [jump_points[0]]
+    for cell in jump_points[1:]:
+        previous = path[-1]
+        step = grid.cols if abs(cell - previous) >= grid.cols else 1
+        if cell < previous:
+            step = -step
+        path.extend(range(previous + step, cell + step, step))
+    return path
+
+
+def iddfs_search(grid, start, goal, mark=None, stats=None):
+    if not connected(grid, start, goal):
+        return None, 0
+    offsets, adj, degree = neighbor_index(grid, stats)
+    with search_state(grid) as state:
+        parent, stamp = state.parent, state.stamp
+        expanded = 0
+        if start == goal:
+            return [start], expanded
+
+        depth = 0
+        while True:
+            seen, _ = state.begin()  # Every iteration starts with nothing seen
+            cutoff = False  # Whether a cell at the depth limit had unseen neighbours
+            stamp[start] = seen
+            parent[start] = -1
+            stack = [(start, 0)]  # Stack to hold (node, current_depth)
+            if stats is not None:
+                stats.pushes += 1
+            while stack:
+                node, node_depth = stack.pop()
+                expanded += 1
+                if stats is not None:
+                    stats.pops += 1
+                    stats.expand(node, len(stack))
+                if mark is not None:
+                    mark(VISIT, node)
+                # If we have not reached the maximum depth
+                if node_depth < depth:
+                    base = offsets[node]
+                    for k in range(base, base + degree[node]):
+                        neighbor = adj[k]
+                        if stamp[neighbor] != seen:
+                            stamp[neighbor] = seen
+                            parent[neighbor] = node
+                            if neighbor == goal:
+                                return build_path(parent, goal), expanded
+                            stack.append((neighbor, node_depth + 1))
+                            if stats is not None:
+                                stats.pushes += 1
+                        elif stats is not None:
+                            stats.revisits += 1
+                elif not cutoff:
+                    base = offsets[node]
+                    cutoff = any(stamp[adj[k]] != seen for k in range(base, base + degree[node]))
+                if mark is not None:
+                    yield
+            if not cutoff:
+                return None, expanded  # Nothing left deeper: the goal is out of reach
+            depth += 1
+
+
+def fringe_search(grid, start, goal, mark=None, stats=None, heuristic=None, weight=None):
+    if not connected(grid, start, goal):
+        return None, 0
+    offsets, adj, degree = neighbor_index(grid, stats)
+    with search_state(grid) as state:
+        cost = grid.cost
+        diagonal, diagonal_step = grid.movement.diagonal, grid.diagonal_step
+        parent, stamp = state.parent, state.stamp
+        g = state.fractional_g() if diagonal else state.g
+        seen, _ = state.begin()
+        stamp[start] = seen
+        parent[start] = -1
+        g[start] = 0
+        if weight is None:
+            weight = HEURISTIC_WEIGHTS.get("FRINGE", 1)
+        h = goal_heuristic(grid, heuristic_name(grid, "FRINGE", heuristic), start, goal, weight, stats)
+        threshold = h(start)
+        now = deque([start])
+        later = deque()
+        expanded = 0
+        if stats is not None:
+            stats.pushes += 1
+
+        while True:
+            next_threshold = math.inf
+
+            while now:
+                current = now.pop()
+                if stats is not None:
+                    stats.pops += 1
+                if mark is not None:
+                    mark(VISIT, current)
+                if current == goal:
+                    return build_path(parent, goal), expanded
+                expanded += 1
+                if stats is not None:
+                    stats.expand(current, len(now) + len(later))
+
+                current_g = g[current]
+                base = offsets[current]
+                for k in range(base, base + degree[current]):
+                    neighbor = adj[k]
+                    tentative_g = current_g + cost[neighbor]
+                    if diagonal and diagonal_step[k]:
+                        tentative_g += (DIAGONAL_COST - 1) * cost[neighbor]
+                    if stamp[neighbor] != seen:
+                        stamp[neighbor] = seen
+                    elif tentative_g >= g[neighbor]:
+                        if stats is not None:
+                            stats.revisits += 1
+                        continue
+                    g[neighbor] = tentative_g
+                    parent[neighbor] = current
+                    f = tentative_g + h(neighbor)
+                    if f <= threshold:
+                        now.appendleft(neighbor)
+                    else:
+                        later.appendleft(neighbor)
+                        next_threshold = min(next_threshold, f)
+                    if stats is not None:
+                        stats.pushes += 1
+                if mark is not None:
+                    yield  # For visual step-by-step execution
+
+            if not later:
+                return None, expanded
+
+            threshold = next_threshold
+            now = later
+            later = deque()
+
+
+def greedy_search(grid, start, goal, mark=None, stats=None, heuristic=None):
+    if not connected(grid, start, goal):
+        return None, 0
+    offsets, adj, degree = neighbor_index(grid, stats)
+    with search_state(grid) as state:
+        name = heuristic_name(grid, "GREEDY", heuristic)
+        h = goal_heuristic(grid, name, start, goal, 1, stats)
+        if name in ("manhattan", "chebyshev", "zero"):
+            open_set = bounded_queue(grid.rows + grid.cols - 1)  # Priorities are 0..rows + cols - 2
+        else:
+            open_set = HeapQueue()
+        push, pop = open_set.push, open_set.pop
+
+        parent, stamp = state.parent, state.stamp
+        _, closed = state.begin()
+        push(h(start), start)
+        parent[start] = -1
+        expanded = 0
+        if stats is not None:
+            stats.pushes += 1
+
+        while True:
+            current = pop()
+            if current < 0:
+                break
+            if stats is not None:
+                stats.pops += 1
+            if stamp[current] == closed:
+                if stats is not None:
+                    stats.stale += 1
+                continue
+            stamp[current] = closed
+            if current == goal:
+                return build_path(parent, goal), expanded
+            expanded += 1
+            if stats is not None:
+                stats.expand(current, len(open_set))
+
+            base = offsets[current]
+            for k in range(base, base + degree[current]):
+                neighbor = adj[k]
+                if stamp[neighbor] == closed:
+                    if stats is not None:
+                        stats.revisits += 1
+                    continue
+                parent[neighbor] = current
+                push(h(neighbor), neighbor)
+                if stats is not None:
+                    stats.pushes += 1
+                if mark is not None:
+                    mark(VISIT, neighbor)
+            if mark is not None:
+                yield
+        return None, expanded
+
+
+def bidirectional_search(grid, start, goal, mark=None, stats=None):
+    if not connected(grid, start, goal):
+        return None, 0
+    if start == goal:
+        return [start], 0
+
+    offsets, adj, degree = neighbor_index(grid, stats)
+    with search_state(grid) as state:
+        # Two queues for the two frontiers. Until the trees meet every cell
+        # belongs to at most one of them, so they share one parent array and
+        # the two stamps of the run tell which side reached a cell.
+        parent, stamp = state.parent, state.stamp
+        forward, backward = state.begin()
+        frontier_start = deque([start])
+        frontier_end = deque([goal])
+        stamp[start] = forward
+        stamp[goal] = backward
+        parent[start] = parent[goal] = -1
+        expanded = 0
+        if stats is not None:
+            stats.pushes += 2
+
+        while frontier_start and frontier_end:
+            # Expand from the start side
+            current = frontier_start.popleft()
+            expanded += 1
+            if stats is not None:
+                stats.pops += 1
+                stats.expand(current, len(frontier_start) + len(frontier_end))
+            base = offsets[current]
+            for k in range(base, base + degree[current]):
+                neighbor = adj[k]
+                side = stamp[neighbor]
+                if side == backward:
+                    if mark is not None:
+                        mark(VISIT, neighbor)
+                    return _join_paths(parent, current, neighbor), expanded
+                if side != forward:
+                    stamp[neighbor] = forward
+                    parent[neighbor] = current
+                    frontier_start.append(neighbor)
+                    if stats is not None:
+                        stats.pushes += 1
+                    if mark is not None:
+                        mark(VISIT, neighbor)
+                elif stats is not None:
+                    stats.revisits += 1
+            if mark is not None:
+                yield
+
+            # Expand from the goal side
+            current = frontier_end.popleft()
+            expanded += 1
+            if stats is not None:
+                stats.pops += 1
+                stats.expand(current, len(frontier_start) + len(frontier_end))
+            base = offsets[current]
+            for k in range(base, base + degree[current]):
+                neighbor = adj[k]
+                side = stamp[neighbor]
+                if side == forward:
+                    if mark is not None:
+                        mark(VISIT_BACK, neighbor)
+                    return _join_paths(parent, neighbor, current), expanded
+                if side != backward:
+                    stamp[neighbor] = backward
+                    parent[neighbor] = current
+                    frontier_end.append(neighbor)
+                    if stats is not None:
+                        stats.pushes += 1
+                    if mark is not None:
+                        mark(VISIT_BACK, neighbor)
+                elif stats is not None:
+                    stats.revisits += 1
+            if mark is not None:
+                yield
+        return None, expanded
+
+
+def _join_paths(parent, near, far):
+    # start -> near up the start tree, then far -> goal up the goal tree
+    path = build_path(parent, near)
+    current = far
+    while current >= 0:
+        path.append(current)
+        current = parent[current]
+    return path
+
+
+def hpa_search(grid, start, goal, mark=None, stats=None):
+    # HPA*: searches the cluster graph kept for this grid and refines only the
+    # route it finds. Paths are near-optimal, not always shortest. The
+    # cluster graph only knows straight steps, so diagonal grids use A*.
+    if not connected(grid, start, goal):
+        return None, 0
+    if grid.movement.diagonal:
+        return (yield from astar_search(grid, start, goal, mark, stats))
+    if stats is None:
+        graph = cluster_graph(grid)
+    else:
+        begin = time.perf_counter()
+        graph = cluster_graph(grid)  # Brought up to date with the grid's edits
+        stats.setup_time += time.perf_counter() - begin
+    visit = None if mark is None else lambda cell: mark(VISIT, cell)
+    return (yield from graph.search(start, goal, visit, stats))
+
+
+SEARCHES = {
+    "BFS": bfs_search,
+    "DFS": dfs_search,
+    "A*": astar_search,
+    "JPS": jps_search,
+    "IDDFS": iddfs_search,
+    "FRINGE": fringe_search,
+    "GREEDY": greedy_search,
+    "BIDIRECTIONAL": bidirectional_search,
+    "HPA*": hpa_search,
+}
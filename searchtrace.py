@@ -0,0 +1,216 @@
+from array import array
+import struct
+import sys
+import zlib
+from settings import *
+from search import SEARCHES
+
+# Event kinds besides search.VISIT and search.VISIT_BACK
+PATH_STEP = 2  # A cell painted as part of the final path
+
+# Every event is one int, cell * 4 + kind. A cell's state after some prefix
+# of the events is 0 (untouched) or the kind of its last event + 1.
+KEYFRAME_INTERVAL = 4096  # Minimum events between two keyframes
+
+# Layout: header, algorithm name, walkable bytes, little-endian uint16 costs,
+# little-endian int32 events, then for each keyframe a uint32 length and the
+# zlib-compressed cell states
+MAGIC = b"GTVT"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIIiiIII")  # magic, version, name length, rows, cols, start, goal, events, interval, keyframes
+KEYFRAME_HEADER = struct.Struct("<I")
+
+
+class Trace:
+    # A recorded search: the terrain it ran on and its events, with the cell
+    # states saved every `interval` events so any position is quick to rebuild
+
+    def __init__(self, algorithm, rows, cols, start, goal, walkable, cost, events, interval=None, keyframes=None):
+        self.algorithm = algorithm
+        self.rows = rows
+        self.cols = cols
+        self.start = start
+        self.goal = goal
+        self.walkable = walkable
+        self.cost = cost
+        self.events = events
+        # Keyframes cost up to one byte per cell before compression, so big grids space them further apart
+        self.interval = interval or max(KEYFRAME_INTERVAL, rows * cols // 16)
+        self.keyframes = keyframes if keyframes is not None else self._build_keyframes()
+
+    def __len__(self):
+        return len(self.events)
+
+    def event(self, index):
+        code = self.events[index]
+        return code & 3, code >> 2
+
+    def _build_keyframes(self):
+        keyframes = []
+        state = bytearray(self.rows * self.cols)
+        interval = self.interval
+        for index, code in enumerate(self.events, 1):
+            state[code >> 2] = (code & 3) + 1
+            if index % interval == 0:
+                keyframes.append(zlib.compress(state, 1))
+        return keyframes
+
+    def keyframe(self, position):
+        # (position of the nearest keyframe at or before position, its cell states)
+        count = min(position // self.interval, len(self.keyframes))
+        if count == 0:
+            return 0, bytearray(self.rows * self.cols)
+        return count * self.interval, bytearray(zlib.decompress(self.keyframes[count - 1]))
+
+    def state_at(self, position):
+        # Cell states after the first `position` events
+        base, state = self.keyframe(position)
+        for code in self.events[base:position]:
+            state[code >> 2] = (code & 3) + 1
+        return state
+
+
+class TraceRecorder:
+    # Collects the events of one run; pass recorder.mark on to the search
+
+    def __init__(self, grid, algorithm):
+        self.algorithm = algorithm
+        self.rows = grid.rows
+        self.cols = grid.cols
+        self.start = grid.start_id
+        self.goal = grid.end_id
+        self.walkable = bytes(grid.walkable)
+        self.cost = array("H", grid.cost)
+        self.events = array("i")
+
+    def mark(self, kind, cell):
+        self.events.append(cell * 4 + kind)
+
+    def record_path(self, path):
+        # In the order reconstruct_path paints it: from the goal back to the start
+        for cell in reversed(path[1:]):
+            if cell != self.goal:
+                self.events.append(cell * 4 + PATH_STEP)
+
+    def finish(self):
+        return Trace(self.algorithm, self.rows, self.cols, self.start, self.goal,
+                     self.walkable, self.cost, self.events)
+
+
+def record_search(grid, algorithm, start, goal):
+    # Runs a search without the UI and returns (trace, path, expanded)
+    grid.start_id, grid.end_id = start, goal
+    recorder = TraceRecorder(grid, algorithm)
+    generator = SEARCHES[algorithm](grid, start, goal, recorder.mark)
+    try:
+        while True:
+            next(generator)
+    except StopIteration as stop:
+        path, expanded = stop.value
+    if path is not None:
+        recorder.record_path(path)
+    return recorder.finish(), path, expanded
+
+
+def save_trace(trace, filename="trace.bin"):
+    name = trace.algorithm.encode()
+    cost = array("H", trace.cost)
+    events = array("i", trace.events)
+    if sys.byteorder != "little":
+        cost.byteswap()
+        events.byteswap()
+    with open(filename, "wb") as trace_file:
+        trace_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(name), trace.rows, trace.cols, trace.start,
+                                     trace.goal, len(events), trace.interval, len(trace.keyframes)))
+        trace_file.write(name)
+        trace_file.write(trace.walkable)
+        trace_file.write(cost)
+        trace_file.write(events)
+        for keyframe in trace.keyframes:
+            trace_file.write(KEYFRAME_HEADER.pack(len(keyframe)))
+            trace_file.write(keyframe)
+    print(f"Trace exported to {filename}")
+
+
+def load_trace(filename="trace.bin"):
+    with open(filename, "rb") as trace_file:
+        data = trace_file.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{filename} is too short to be a trace")
+    magic, version, name_length, rows, cols, start, goal, count, interval, keyframe_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a trace file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{filename} uses unsupported trace format version {version}")
+    size = rows * cols
+    offset = HEADER.size
+    if len(data) < offset + name_length + 3 * size + 4 * count:
+        raise ValueError(f"{filename} is truncated")
+    algorithm = data[offset:offset + name_length].decode()
+    offset += name_length
+    walkable = data[offset:offset + size]
+    offset += size
+    cost = array("H", data[offset:offset + 2 * size])
+    offset += 2 * size
+    events = array("i", data[offset:offset + 4 * count])
+    offset += 4 * count
+    if sys.byteorder != "little":
+        cost.byteswap()
+        events.byteswap()
+    keyframes = []
+    for _ in range(keyframe_count):
+        (length,) = KEYFRAME_HEADER.unpack_from(data, offset)
+        offset += KEYFRAME_HEADER.size
+        keyframes.append(data[offset:offset + length])
+        offset += length
+    print(f"Trace loaded from {filename}")
+    return Trace(algorithm, rows, cols, start, goal, walkable, cost, events, interval, keyframes)
+
+
+class TracePlayer:
+    # Shows a trace on a grid at any position; stepping forward applies single
+    # events, other jumps restore the nearest keyframe for the touched cells
+
+    def __init__(self, grid, trace):
+        if (trace.rows, trace.cols) != (grid.rows, grid.cols):
+            raise ValueError(f"The trace was recorded on a {trace.rows}x{trace.cols} grid, "
+                             f"the grid is {grid.rows}x{grid.cols}")
+        self.grid = grid
+        self.trace = trace
+        grid.walkable[:] = trace.walkable
+        grid.cost[:] = trace.cost
+        grid.start_id, grid.end_id = trace.start, trace.goal
+        grid.invalidate_neighbor_index()
+        grid.recolor_from_terrain()
+        self.base = bytes(grid.color)  # Colors of untouched cells
+        self.colors = [None, grid.color_index(GREEN), grid.color_index(VIBRANT_BLUE), grid.color_index(PATH_COLOR)]
+        self.state = bytearray(grid.size)
+        self.position = 0
+
+    def _show(self, cell, value):
+        self.state[cell] = value
+        if cell != self.trace.start and cell != self.trace.goal:
+            self.grid.paint(cell, self.colors[value] if value else self.base[cell])
+
+    def seek(self, position):
+        position = max(0, min(position, len(self.trace)))
+        events = self.trace.events
+        if self.position < position <= self.position + self.trace.interval:
+            for code in events[self.position:position]:
+                self._show(code >> 2, (code & 3) + 1)
+        elif position != self.position:
+            # Only cells with events between the two positions can differ
+            low, high = sorted((self.position, position))
+            base, keyframe = self.trace.keyframe(position)
+            for cell in {code >> 2 for code in events[low:high]}:
+                self._show(cell, keyframe[cell])
+            for code in events[base:position]:
+                self._show(code >> 2, (code & 3) + 1)
+        self.position = position
+
+    def playback(self):
+        # Generator for the Stepper; follows seeks made while it is paused
+        while self.position < len(self.trace):
+            self.seek(self.position + 1)
+            yield
+        print(f"Replayed {len(self.trace)} events of {self.trace.algorithm}")
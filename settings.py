@@ -7,6 +7,10 @@ SCREEN_HEIGHT = 800
 
 FPS = 60
 
+# Grids with at least this many cells are drawn from a NumPy color array
+# instead of tile by tile (when NumPy is installed)
+ARRAY_RENDER_MIN_CELLS = 10000
+
 # Colors
 WHITE = (255, 255, 255)
 GRAY = (200, 200, 200)
@@ -52,4 +56,28 @@ PATH_COLOR = (255, 110, 110)  # Coral (matches Utility Buttons)
 
 
 STEP_DELAY = 50  # milliseconds
+SEARCH_WORKER = None  # Run searches in the main loop (None), a "thread" or a "process"
+RACE_ALGORITHMS = ["BFS", "A*", "JPS", "BIDIRECTIONAL"]  # Raced with 'R' until Shift+click picks others
+RACE_MODE = "lockstep"  # Race views step in "lockstep" or get equal "wall clock" time
+FRAME_BUDGET = 8  # milliseconds of each frame spent stepping at the fastest animated speed
+MAZE_ALGORITHM = "backtracker"  # LABYRINTH generator, cycled with 'G' (see labyrinth.GENERATORS)
+MAZE_SEED = None  # Fixed seed for LABYRINTH, None picks (and prints) a new one each time
+OBSTACLE_DENSITY = 0.3  # Share of walls in "obstacles" mazes
+TERRAIN_MAX_COST = 9  # "terrain" mazes have tile costs 1..TERRAIN_MAX_COST
+TERRAIN_SCALE = 16  # Cells between the value noise lattice points of "terrain"
+TERRAIN_OCTAVES = 3
+PRIORITY_QUEUE = "auto"  # "auto" uses bucket queues where they are exact, "heap" always uses heapq
+BUCKET_QUEUE_MAX_WIDTH = 1024  # Widest priority spread (2 * highest tile cost + 2 for A*) given a bucket queue
+CLUSTER_SIZE = 16  # Side of the square clusters HPA* cuts the grid into
+ENTRANCE_SPLIT = 6  # HPA* entrances at least this long get a transition every ENTRANCE_SPLIT tiles and at the last, instead of one in the middle
+LANDMARK_COUNT = 8  # Landmarks the ALT heuristic keeps a distance array for
+ACTIVE_LANDMARKS = 4  # Of those, how many each query consults
+LANDMARK_MAX_BYTES = 64 * 1024 * 1024  # Fewer landmarks are kept where LANDMARK_COUNT arrays would not fit
+MOVEMENT = "4"  # How new grids connect tiles, one of movement.MOVEMENTS; cycled with 'N'
+ALGORITHM_HEURISTICS = {"A*": "landmarks", "FRINGE": "landmarks"}  # Heuristic per algorithm (see search.HEURISTICS); unlisted ones use the movement's default
+HEURISTIC_WEIGHTS = {}  # Weighted A*: f = g + weight * h per algorithm, 1 if not listed
+HEURISTIC_WEIGHT_STEPS = [1, 1.25, 1.5, 2, 3, 5]  # Weights '+' / '-' step through
+FIELD_SHADES = 24  # Colors of the 'D' distance heat map, from FIELD_NEAR_COLOR to FIELD_FAR_COLOR
+FIELD_NEAR_COLOR = EMERALD
+FIELD_FAR_COLOR = ROYAL_BLUE
 last_step_time = 0
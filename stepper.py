@@ -0,0 +1,101 @@
+import time
+from settings import *
+
+# Special speeds; positive speeds are steps per frame
+DELAYED = 0  # One step every STEP_DELAY milliseconds
+BUDGET = -1  # As many steps as fit in FRAME_BUDGET milliseconds
+COMPLETE = -2  # Finish the search within the frame and show the final state
+
+SPEEDS = [DELAYED, 1, 4, 16, 64, 256, 1024, BUDGET, COMPLETE]
+
+# Yielded by a generator that is waiting on a background worker; ends the frame's stepping
+WAITING = object()
+
+
+class Stepper:
+    # Advances the running algorithm generator from the main loop
+
+    def __init__(self, budget_ms=FRAME_BUDGET):
+        self.generator = None
+        self.budget = budget_ms / 1000
+        self.speed_index = 0
+        self.paused = False
+        self.last_step_time = 0
+
+    @property
+    def speed(self):
+        return SPEEDS[self.speed_index]
+
+    @property
+    def running(self):
+        return self.generator is not None
+
+    def start(self, generator, now=0):
+        self.stop()
+        self.generator = generator
+        self.last_step_time = now - STEP_DELAY  # The first step happens right away
+
+    def stop(self):
+        if self.generator is not None:
+            self.generator.close()  # Lets a background search cancel its worker
+        self.generator = None
+
+    def faster(self):
+        self.speed_index = min(self.speed_index + 1, len(SPEEDS) - 1)
+
+    def slower(self):
+        self.speed_index = max(self.speed_index - 1, 0)
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+
+    def step(self):
+        # Advances one step; returns False once the generator is exhausted or
+        # has nothing to show until a later frame
+        if self.generator is None:
+            return False
+        try:
+            return next(self.generator) is not WAITING
+        except StopIteration:
+            self.generator = None  # Done
+            return False
+
+    def step_once(self):
+        # Single-stepping pauses the automatic stepping
+        self.paused = True
+        self.step()
+
+    def finish(self):
+        while self.step():
+            pass
+
+    def update(self, now):
+        # Called once per frame with the current time in milliseconds
+        if self.generator is None or self.paused:
+            return
+        speed = self.speed
+        if speed == DELAYED:
+            if now - self.last_step_time >= STEP_DELAY and self.step():
+                self.last_step_time = now
+        elif speed == COMPLETE:
+            self.finish()
+        elif speed == BUDGET:
+            deadline = time.perf_counter() + self.budget
+            while self.step() and time.perf_counter() < deadline:
+                pass
+        else:
+            for _ in range(speed):
+                if not self.step():
+                    break
+
+    def describe(self):
+        speed = self.speed
+        if speed == DELAYED:
+            label = f"1 step / {STEP_DELAY} ms"
+        elif speed == BUDGET:
+            label = f"{FRAME_BUDGET} ms / frame"
+        elif speed == COMPLETE:
+            label = "instant"
+        else:
+            label = f"{speed} step{'s' if speed > 1 else ''} / frame"
+        return label + (" (paused)" if self.paused else "")
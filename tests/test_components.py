@@ -0,0 +1,34 @@
+import random
+from compactgrid import CompactGrid
+from components import Components, components, connected
+
+
+def test_closing_two_cells_in_one_sync_splits_a_corridor():
+    grid = CompactGrid(1, 6)
+    components(grid)
+    grid.set_walkable(2, False)
+    grid.set_walkable(3, False)
+    assert not connected(grid, 0, 5)
+    assert components(grid).count() == 2
+
+
+def test_batched_edits_match_a_fresh_build():
+    rng = random.Random(7)
+    for _ in range(50):
+        grid = CompactGrid(rng.randint(1, 10), rng.randint(1, 10), movement=rng.choice(["4", "8"]))
+        for cell in range(grid.size):
+            if rng.random() < 0.3:
+                grid.set_walkable(cell, False)
+        labels = Components(grid)
+        labels.build()
+        for _ in range(5):
+            for _ in range(rng.randint(1, 6)):
+                cell = rng.randrange(grid.size)
+                grid.set_walkable(cell, not grid.walkable[cell])
+            labels.sync()
+            fresh = Components(grid)
+            fresh.build()
+            assert labels.count() == fresh.count()
+            for a in range(grid.size):
+                for b in range(grid.size):
+                    assert labels.connected(a, b) == fresh.connected(a, b)
@@ -0,0 +1,49 @@
+import json
+import pytest
+from compactgrid import CompactGrid
+from mazeJSON import export_maze_to_json, load_maze_from_json
+
+
+def _maze(tmp_path, rows=2, cols=3, **tile):
+    tiles = [[dict({"walkable": True, "cost": 1}, **tile) for _ in range(cols)] for _ in range(rows)]
+    filename = tmp_path / "maze.json"
+    filename.write_text(json.dumps({"start": None, "end": None, "tiles": tiles}))
+    return str(filename)
+
+
+def _edited_grid():
+    grid = CompactGrid(2, 3)
+    grid.block_cell(1)
+    grid.set_cell_cost(4, 7)
+    return grid
+
+
+def _terrain(grid):
+    return bytes(grid.walkable), list(grid.cost), bytes(grid.color), grid.start_id, grid.end_id
+
+
+def test_malformed_file_leaves_the_grid_untouched(tmp_path):
+    grid = _edited_grid()
+    before = _terrain(grid)
+    with pytest.raises(ValueError):
+        load_maze_from_json(grid, _maze(tmp_path, rows=3))
+    assert _terrain(grid) == before
+
+
+@pytest.mark.parametrize("cost", [-1, 65536, 1.5])
+def test_out_of_range_cost_is_rejected(tmp_path, cost):
+    grid = _edited_grid()
+    before = _terrain(grid)
+    with pytest.raises(ValueError):
+        load_maze_from_json(grid, _maze(tmp_path, cost=cost))
+    assert _terrain(grid) == before
+
+
+def test_round_trip(tmp_path):
+    grid = _edited_grid()
+    filename = str(tmp_path / "round.json")
+    export_maze_to_json(grid, filename)
+    loaded = CompactGrid(2, 3)
+    load_maze_from_json(loaded, filename)
+    assert bytes(loaded.walkable) == bytes(grid.walkable)
+    assert list(loaded.cost) == list(grid.cost)
@@ -0,0 +1,46 @@
+import pygame
+from settings import *
+
+
+class Timeline:
+    # Progress bar of a searchtrace.TracePlayer; click or drag it to seek
+
+    def __init__(self, x, y, width, height):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.player = None  # Hidden while nothing is replayed
+        self.dragging = False
+        self.drawn = None  # (player, filled width) at the last draw
+
+    def _filled(self):
+        if self.player is None or not len(self.player.trace):
+            return 0
+        return self.rect.width * self.player.position // len(self.player.trace)
+
+    def draw(self, surface):
+        pygame.draw.rect(surface, CHARCOAL, self.rect)
+        if self.player is not None:
+            pygame.draw.rect(surface, DARK_GRAY, self.rect)
+            pygame.draw.rect(surface, ACTIVE_BTN, (self.rect.x, self.rect.y, self._filled(), self.rect.height))
+            pygame.draw.rect(surface, WARM_GRAY, self.rect, 1)  # border
+        self.drawn = (self.player, self._filled())
+
+    def refresh(self, surface):
+        if (self.player, self._filled()) == self.drawn:
+            return None
+        self.draw(surface)
+        return self.rect
+
+    def _seek(self, x):
+        fraction = min(max((x - self.rect.x) / self.rect.width, 0), 1)
+        self.player.seek(round(fraction * len(self.player.trace)))
+
+    def handle_event(self, event):
+        if self.player is None:
+            return
+        if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
+            self.dragging = True
+            self._seek(event.pos[0])
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            self._seek(event.pos[0])
+        elif event.type == pygame.MOUSEBUTTONUP:
+            self.dragging = False
@@ -1,9 +1,101 @@
+import pygame
 from settings import *
+from compactgrid import START, END, BLOCKED_COLOR
+
+try:
+    import numpy as np
+except ImportError:  # The tile-by-tile renderer works without it
+    np = None
+
+BORDER_KEY = (255, 0, 255)  # Transparent color of the border overlay
+
+
+class ArrayRenderer:
+    # Keeps a (rows, cols, 3) array with the color every tile is shown in and
+    # draws the grid by scaling a one-pixel-per-cell surface of it to the tile
+    # size, with the tile borders blitted on top from a cached overlay
+
+    def __init__(self, grid, area):
+        self.grid = grid
+        self.area = area
+        self.tile_size = grid.tile_size
+        self.colors = np.zeros((grid.rows, grid.cols, 3), dtype=np.uint8)
+        self.cells = pygame.Surface((grid.cols, grid.rows), depth=32)
+        self.borders = self._make_borders() if self.tile_size >= 3 else None
+
+    def _make_borders(self):
+        # The same outline pygame.draw.rect(..., 1) gives each tile
+        size = self.tile_size
+        overlay = pygame.Surface(self.area.size)
+        overlay.fill(BORDER_KEY)
+        for col in range(self.grid.cols):
+            for x in (col * size, col * size + size - 1):
+                pygame.draw.line(overlay, GRID_BORDER, (x, 0), (x, self.area.height - 1))
+        for row in range(self.grid.rows):
+            for y in (row * size, row * size + size - 1):
+                pygame.draw.line(overlay, GRID_BORDER, (0, y), (self.area.width - 1, y))
+        overlay.set_colorkey(BORDER_KEY)
+        return overlay
+
+    def _tile_colors(self, cells=None):
+        # Shown color of the given cells (all when None), in Tile.draw's precedence
+        grid = self.grid
+        color = np.frombuffer(grid.color, dtype=np.uint8)
+        walkable = np.frombuffer(grid.walkable, dtype=np.uint8)
+        flags = np.frombuffer(grid.flags, dtype=np.uint8)
+        if cells is not None:
+            color, walkable, flags = color[cells], walkable[cells], flags[cells]
+        shown = np.array(grid.palette, dtype=np.uint8)[color]
+        shown[(flags & END) != 0] = GOAL_TILE
+        shown[(flags & START) != 0] = START_TILE
+        shown[walkable == 0] = BLOCKED_COLOR
+        return shown
+
+    def draw(self, surface):
+        cells = self.grid.take_dirty()
+        if cells is None:
+            self.colors.reshape(-1, 3)[:] = self._tile_colors()
+            top, left, bottom, right = 0, 0, self.grid.rows, self.grid.cols
+        elif cells:
+            cells = np.fromiter(cells, dtype=np.intp, count=len(cells))
+            self.colors.reshape(-1, 3)[cells] = self._tile_colors(cells)
+            rows, cols = np.divmod(cells, self.grid.cols)
+            top, left, bottom, right = rows.min(), cols.min(), rows.max() + 1, cols.max() + 1
+        else:
+            return []
+
+        # Only the bounding box of the changed cells is copied and scaled
+        pixels = pygame.surfarray.pixels3d(self.cells)
+        pixels[left:right, top:bottom] = self.colors[top:bottom, left:right].transpose(1, 0, 2)
+        del pixels  # Unlocks the surface
+        size = self.tile_size
+        source = self.cells.subsurface((left, top, right - left, bottom - top))
+        target = pygame.Rect(self.area.x + left * size, self.area.y + top * size,
+                             (right - left) * size, (bottom - top) * size)
+        if size == 1:
+            surface.blit(source, target)
+        else:
+            surface.blit(pygame.transform.scale(source, target.size), target)
+        if self.borders is not None:
+            surface.blit(self.borders, target, target.move(-self.area.x, -self.area.y))
+        return [target]
 
 
 class Visualizer:
-    def __init__(self, grid):
+    def __init__(self, grid, min_array_cells=ARRAY_RENDER_MIN_CELLS):
         self.grid = grid
+        self.area = pygame.Rect(0, 0, grid.cols * grid.tile_size, grid.rows * grid.tile_size)
+        self.renderer = None
+        if np is not None and grid.size >= min_array_cells:
+            self.renderer = ArrayRenderer(grid, self.area)
 
     def draw(self, surface):
-        self.grid.draw(surface)
+        if self.renderer is not None:
+            return self.renderer.draw(surface)
+        # Tiles are drawn onto the persistent screen surface only when their look
+        # changed; returns the rects that have to be pushed to the display
+        cells = self.grid.take_dirty()
+        if cells is None:
+            self.grid.draw(surface)
+            return [self.area]
+        return [self.grid.draw_cell(surface, cell) for cell in cells]